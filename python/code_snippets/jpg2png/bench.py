@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+
+"""Docstring for bench.py module.
+Summary
+-------
+    The script called 'bench' measures the throughput of 'jpg2png'. It
+    creates a deterministic synthetic corpus of jpg-files and converts it
+    with different settings. The results are printed as json, so runs of
+    different versions can be compared.
+
+Functions
+---------
+    '_synthetic_jpg',
+    'make_corpus',
+    '_percentile',
+    '_tree_rss_kb',
+    '_max_rss_kb',
+    '_sample_rss',
+    '_run_setting',
+    'bench',
+    'main'
+
+Examples
+--------
+    To run script
+    'python bench.py'
+
+    To compare worker counts and profiles on a larger corpus
+    'python bench.py --count 500 --size 4000x3000 --workers 1 8 '
+    '--profile fast balanced --output bench.json'
+"""
+
+import json
+import platform
+from os import getpid, sysconf
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from io import StringIO
+from itertools import product
+from multiprocessing import get_context
+from pathlib import Path
+from random import Random
+from resource import getrusage, RUSAGE_CHILDREN, RUSAGE_SELF
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from time import perf_counter
+
+import PIL
+from PIL import Image, ImageDraw
+
+import jpg2png
+
+
+def _synthetic_jpg(rng, size):
+    """Helper function that draws a reproducible photo-like image.
+
+    Parameters
+    ----------
+    rng : random.Random
+        The 'rng' is the seeded random generator.
+
+    size : tuple(int, int)
+        The 'size' is the width and height of the image.
+
+    Returns
+    -------
+    pic : PIL.Image
+        An RGB image with a gradient, shapes and fine grain, so that it
+        compresses roughly like a camera image.
+    """
+    width, height = size
+    pic = Image.merge("RGB", [
+        Image.linear_gradient("L").rotate(rng.randrange(360)).resize(size)
+        for _ in range(3)])
+
+    draw = ImageDraw.Draw(pic)
+    for _ in range(24):
+        x, y = rng.randrange(width), rng.randrange(height)
+        w, h = rng.randrange(1, width // 3 + 2), rng.randrange(1,
+                                                               height // 3 + 2)
+        fill = tuple(rng.randrange(256) for _ in range(3))
+        draw.ellipse((x, y, x + w, y + h), fill=fill)
+
+    grain_size = (max(1, width // 4), max(1, height // 4))
+    grain = Image.frombytes("L", grain_size, rng.randbytes(
+        grain_size[0] * grain_size[1])).resize(size).convert("RGB")
+    return Image.blend(pic, grain, 0.15)
+
+
+def make_corpus(corpus_dir, count=50, sizes=((1920, 1080),),
+                qualities=(85,), seed=0):
+    """
+    The function creates a deterministic synthetic jpg corpus.
+
+    Parameters
+    ----------
+    corpus_dir : str
+        The 'corpus_dir' is the directory where the jpg-files are written.
+        It is created if it does not exist.
+
+    count : int(optional)
+        The 'count' is the number of jpg-files.
+
+    sizes : list(optional)
+        The 'sizes' are (width, height) tuples, used in turn.
+
+    qualities : list(optional)
+        The 'qualities' are jpeg quality settings, used in turn.
+
+    seed : int(optional)
+        The 'seed' of the random generator. The same seed, count, sizes and
+        qualities always give the same corpus.
+
+    Returns
+    -------
+    corpus : dict
+        The 'corpus' describes the created files: 'files', 'bytes' and the
+        settings used to create them.
+
+    Notes
+    -----
+    Files that already exist are kept, so a corpus is only created once.
+    """
+    corpus_dir = Path(corpus_dir)
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    total_bytes = 0
+    for i in range(count):
+        size = sizes[i % len(sizes)]
+        quality = qualities[i % len(qualities)]
+        jpg_path = corpus_dir / f"{seed}_{i:06d}_{size[0]}x{size[1]}_" \
+                                f"q{quality}.jpg"
+        if not jpg_path.exists():
+            rng = Random(f"{seed}-{i}")
+            _synthetic_jpg(rng, size).save(jpg_path, "jpeg", quality=quality)
+        total_bytes += jpg_path.stat().st_size
+
+    return {"dir": str(corpus_dir.absolute()), "files": count,
+            "bytes": total_bytes, "sizes": [list(i) for i in sizes],
+            "qualities": list(qualities), "seed": seed}
+
+
+def _percentile(values, percent):
+    """Helper function that returns the nearest-rank percentile.
+
+    Parameters
+    ----------
+    values : list
+        The 'values' are the measured numbers.
+
+    percent : float
+        The 'percent' e.g. 50 or 99.
+
+    Returns
+    -------
+    float
+        The percentile of 'values', or 0.0 if 'values' is empty.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(percent / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def _tree_rss_kb(pid):
+    """Helper function that sums the resident memory of a process tree.
+
+    Parameters
+    ----------
+    pid : int
+        The 'pid' of the process. All its descendants are included, e.g.
+        the workers of a process pool and a forkserver with its workers.
+
+    Returns
+    -------
+    int
+        The resident memory in kilobytes, read from /proc, or None if
+        /proc is not available.
+    """
+    if not Path("/proc/self/stat").exists():
+        return None
+    page_kb = sysconf("SC_PAGE_SIZE") // 1024
+    children, rss = {}, {}
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # The fields after the command name, 'ppid' is 1, 'rss' is 21.
+            fields = stat_path.read_text().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        child = int(stat_path.parent.name)
+        children.setdefault(int(fields[1]), []).append(child)
+        rss[child] = int(fields[21]) * page_kb
+
+    total = 0
+    stack = [pid]
+    while stack:
+        tree_pid = stack.pop()
+        total += rss.get(tree_pid, 0)
+        stack.extend(children.get(tree_pid, ()))
+    return total
+
+
+def _max_rss_kb():
+    """Helper function that returns the largest resident memory so far.
+
+    Returns
+    -------
+    int
+        The larger 'ru_maxrss' of this process and its waited-for children,
+        in kilobytes. macOS reports it in bytes, so it is converted.
+    """
+    max_rss = max(getrusage(RUSAGE_SELF).ru_maxrss,
+                  getrusage(RUSAGE_CHILDREN).ru_maxrss)
+    if platform.system() == "Darwin":
+        return max_rss // 1024
+    return max_rss
+
+
+def _sample_rss(stop, peak, interval=0.05):
+    """Helper function that records the peak memory of this process tree.
+
+    Parameters
+    ----------
+    stop : threading.Event
+        The sampling ends when 'stop' is set.
+
+    peak : dict
+        The 'peak' is updated with the largest 'rss_kb' seen.
+
+    interval : float(optional)
+        The seconds between two samples.
+    """
+    pid = getpid()
+    while True:
+        rss_kb = _tree_rss_kb(pid)
+        if rss_kb is None:
+            return
+        peak["rss_kb"] = max(peak.get("rss_kb", 0), rss_kb)
+        if stop.wait(interval):
+            return
+
+
+def _run_setting(corpus_dir, setting):
+    """Helper function that benchmarks one setting in a fresh process.
+
+    Parameters
+    ----------
+    corpus_dir : str
+        The 'corpus_dir' is the directory of the synthetic corpus.
+
+    setting : dict
+        The 'setting' are keyword arguments of 'jpg2png.main'.
+
+    Returns
+    -------
+    result : dict
+        The 'result' holds files/sec, MB/sec, per-file latency percentiles
+        and the peak resident memory of the run.
+
+    Notes
+    -----
+    Throughput and latency come from the same 'jpg2png.main' run. The
+    latency of a file is the sum of its read, decode, encode and write
+    seconds in the run report, so it reflects the workers and pipeline of
+    the setting. The peak memory is the largest sum of this process and
+    its workers, sampled from /proc. Without /proc it is the largest
+    single process from getrusage instead.
+    """
+    jpg_paths = list(jpg2png.scan_jpgs(Path(corpus_dir)))
+    source_bytes = sum(i.stat().st_size for i in jpg_paths)
+
+    stop, peak = Event(), {}
+    sampler = Thread(target=_sample_rss, args=(stop, peak), daemon=True)
+    with TemporaryDirectory() as tmp_dir, redirect_stdout(StringIO()):
+        report_file = str(Path(tmp_dir) / "report.json")
+        sampler.start()
+        start = perf_counter()
+        converted = jpg2png.main(corpus_dir, str(Path(tmp_dir) / "run"),
+                                 report_file=report_file, **setting)
+        seconds = perf_counter() - start
+        stop.set()
+        sampler.join()
+
+        with open(report_file) as f:
+            per_file = json.load(f)["per_file"]
+    latencies = [sum(stats[stage] for stage in ("read", "decode", "encode",
+                                                "write"))
+                 for stats in per_file]
+
+    peak_rss = peak.get("rss_kb") or _max_rss_kb()
+    return {
+        "setting": setting,
+        "files": len(jpg_paths),
+        "converted": sum(converted.values()) if converted else 0,
+        "seconds": seconds,
+        "files_per_sec": len(jpg_paths) / seconds,
+        "mb_per_sec": source_bytes / 1e6 / seconds,
+        "latency_p50_ms": _percentile(latencies, 50) * 1000,
+        "latency_p99_ms": _percentile(latencies, 99) * 1000,
+        "peak_rss_kb": peak_rss,
+    }
+
+
+def bench(corpus_dir, settings):
+    """
+    The function benchmarks 'jpg2png' for a list of settings.
+
+    Parameters
+    ----------
+    corpus_dir : str
+        The 'corpus_dir' is the directory of the corpus, see 'make_corpus'.
+
+    settings : list
+        The 'settings' is a list of dict objects with keyword arguments of
+        'jpg2png.main', e.g. [{'workers': 4, 'profile': 'fast'}].
+
+    Returns
+    -------
+    results : list
+        The 'results' has one dict per setting, see '_run_setting'.
+
+    Notes
+    -----
+    Each setting runs in its own freshly spawned process, so the peak
+    memory of one setting does not leak into the next. 'peak_rss_kb' is
+    the peak of the whole run in kilobytes. Without /proc, e.g. on macOS,
+    it is the peak of the largest single process.
+    """
+    results = []
+    for setting in settings:
+        with ProcessPoolExecutor(max_workers=1,
+                                 mp_context=get_context("spawn")) as pool:
+            results.append(pool.submit(_run_setting, corpus_dir,
+                                       setting).result())
+    return results
+
+
+def main(corpus_dir=None, count=50, sizes=((1920, 1080),), qualities=(85,),
+         seed=0, workers=(1,), profiles=("balanced",), max_size=None):
+    """
+    The recipe function for benchmarking of jpg2png.
+
+    Parameters
+    ----------
+    corpus_dir : str(optional)
+        The 'corpus_dir' is where the corpus is kept. If None, a temporary
+        corpus is created and deleted afterwards.
+
+    count, sizes, qualities, seed : optional
+        The corpus settings, see 'make_corpus'.
+
+    workers : list(optional)
+        The 'workers' counts to benchmark.
+
+    profiles : list(optional)
+        The png 'profiles' to benchmark, see 'jpg2png.PNG_PROFILES'.
+
+    max_size : tuple(int, int)(optional)
+        The 'max_size' passed to every run.
+
+    Returns
+    -------
+    report : dict
+        The 'report' with the corpus, the environment and one result per
+        combination of 'workers' and 'profiles'.
+    """
+    settings = [{"workers": worker, "profile": profile, "max_size": max_size}
+                for worker, profile in product(workers, profiles)]
+
+    with TemporaryDirectory() as tmp_dir:
+        corpus = make_corpus(corpus_dir or tmp_dir, count=count, sizes=sizes,
+                             qualities=qualities, seed=seed)
+        results = bench(corpus["dir"], settings)
+
+    return {
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "machine": platform.machine(),
+        "corpus": corpus,
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    args = ArgumentParser(description="Benchmark of jpg2png on a synthetic "
+                                      "corpus")
+    args.add_argument(
+        "--corpus", type=str, default=None,
+        help="Directory to keep the corpus in, reused between runs")
+    args.add_argument(
+        "--count", type=int, default=50,
+        help="The number of jpg-files in the corpus")
+    args.add_argument(
+        "--size", type=jpg2png._parse_size, action="append", default=None,
+        help="Resolution WxH of the jpg-files, repeatable")
+    args.add_argument(
+        "--quality", type=int, action="append", default=None,
+        help="Jpeg quality of the jpg-files, repeatable")
+    args.add_argument(
+        "--seed", type=int, default=0,
+        help="Seed of the synthetic corpus")
+    args.add_argument(
+        "--workers", type=int, nargs="+", default=[1],
+        help="Worker counts to benchmark")
+    args.add_argument(
+        "--profile", type=str, nargs="+", default=["balanced"],
+        choices=list(jpg2png.PNG_PROFILES),
+        help="Png profiles to benchmark")
+    args.add_argument(
+        "--max-size", type=jpg2png._parse_size, default=None,
+        help="Shrink pngs to fit inside WxH")
+    args.add_argument(
+        "--output", type=str, default=None,
+        help="Write the json report to this file instead of stdout")
+    bench_args = args.parse_args()
+
+    report = main(corpus_dir=bench_args.corpus, count=bench_args.count,
+                  sizes=bench_args.size or [(1920, 1080)],
+                  qualities=bench_args.quality or [85],
+                  seed=bench_args.seed, workers=bench_args.workers,
+                  profiles=bench_args.profile, max_size=bench_args.max_size)
+
+    if bench_args.output:
+        with open(bench_args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
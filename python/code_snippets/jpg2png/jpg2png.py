@@ -11,10 +11,53 @@ Functions
 ---------
     'is_dir',
     '_filter_jpg',
+    '_is_excluded',
+    'scan_jpgs',
     'is_file_jpg',
     'load_jpgs',
     'make_dir',
+    '_stem_clashes',
+    '_png_path',
+    '_claim_pngs',
+    '_file_hash',
+    '_skip_failed',
+    'load_manifest',
+    'save_manifest',
+    '_changed_jpgs',
+    'prune_manifest',
+    '_write_png',
+    '_link_png',
+    '_unique_jpgs',
+    '_link_duplicates',
+    '_bounded_map',
+    '_parse_size',
+    '_reduce',
+    '_check_options',
+    '_encode_png',
+    '_file_stats',
+    '_convert_jpg',
+    '_pipeline_map',
+    '_decoded_bytes',
+    '_scheduled_map',
+    'convert_bytes',
+    '_convert_payload',
+    'convert_many',
+    '_timed_iter',
+    '_new_report',
+    '_print_progress',
+    '_finish_report',
+    '_collect_results',
     'jpg2png',
+    '_is_archive',
+    '_archive_jpgs',
+    '_safe_members',
+    '_archive_writer',
+    'convert_archive',
+    '_poll_dir',
+    '_poll_jpgs',
+    '_inotify_jpgs',
+    'watch_jpgs',
+    'watch',
     'main'
 
 Examples
@@ -25,11 +68,94 @@ Examples
     To run script using python shebang
     'chmod +x ./jpg2png.py'
     './jpg2png ./source_dir target'
+
+    To run script with a pool of 4 worker processes
+    './jpg2png ./source_dir target --workers 4'
+
+    To convert a whole directory tree, skipping thumbnails
+    './jpg2png ./source_dir target --recursive --exclude "*_thumb.jpg"'
+
+    To only convert new or changed files and drop pngs of deleted files
+    './jpg2png ./source_dir target --incremental --prune'
+
+    To trade file size for encoding speed
+    './jpg2png ./source_dir target --profile fast'
+
+    To create thumbnails, decoding large jpgs at reduced resolution
+    './jpg2png ./source_dir target --max-size 320x240'
+
+    To overlap disk reads and writes with encoding on slow storage
+    './jpg2png ./source_dir target --pipeline --workers 8 --readers 4'
+
+    To convert byte-identical jpg-files only once
+    './jpg2png ./source_dir target --dedup'
+
+    To keep running and convert new jpg-files as they land
+    './jpg2png ./source_dir target --watch --workers 4'
+
+    To show live progress and write a json report with per-stage timings
+    './jpg2png ./source_dir target --progress --report run.json'
+
+    To convert in memory, e.g. inside a web service
+    'from jpg2png import convert_bytes'
+    'png_data = convert_bytes(jpg_data, profile="fast")'
+
+    To convert a tar or zip archive straight into a new archive
+    './jpg2png ./photos.tar.gz ./pngs.zip --workers 4'
+
+    To convert large panoramas first, decoding at most 2 GB at once
+    './jpg2png ./source_dir target --workers 8 --schedule --memory-budget 2000'
 """
 
-from pathlib import Path
+import json
+import tarfile
+from hashlib import sha256
+from os import link, scandir, stat, walk
+from os.path import join
+from shutil import copyfile
+from fnmatch import fnmatch
+from pathlib import Path, PurePath, PurePosixPath
 from PIL import Image
 from argparse import ArgumentParser
+from bisect import bisect_right
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from functools import partial
+from io import BytesIO
+from queue import Queue
+from sys import stderr
+from threading import Thread
+from itertools import chain, tee
+from time import perf_counter, sleep, time
+from zipfile import BadZipFile, ZipFile, ZIP_STORED
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+JPG_SUFFIXES = (".jpg", ".jpeg")
+MANIFEST_NAME = ".jpg2png_manifest.json"
+HASH_CACHE_NAME = ".jpg2png_hashes.json"
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2",
+                    ".tar.xz", ".txz")
+# Compression of tarfile streams by suffix, plain '.tar' has none.
+TAR_MODES = {".gz": "gz", ".tgz": "gz", ".bz2": "bz2", ".tbz2": "bz2",
+             ".xz": "xz", ".txz": "xz"}
+
+# Errors of a single bad jpg-file, the file is reported 'False' and the run
+# goes on. Pillow's MAX_IMAGE_PIXELS is kept, since the input is not trusted,
+# so images above it fail with DecompressionBombError like broken files.
+DECODE_ERRORS = (OSError, Image.DecompressionBombError)
+
+# Keyword arguments for PIL.Image.save, from fastest to smallest png-files.
+PNG_PROFILES = {
+    "fast": {"compress_level": 1},
+    "balanced": {"compress_level": 6},
+    "smallest": {"compress_level": 9, "optimize": True},
+}
 
 
 def is_dir(dir_name: str):
@@ -84,20 +210,92 @@ def _filter_jpg(file_name):
     Returns
     -------
     bool
-        If the 'file_name' ends with '*.jpg'
+        If the 'file_name' ends with '*.jpg' or '*.jpeg' in any letter case.
 
     See Also
     --------
-    jpg2png.is_file_jpg : To see where helper function is implemented.
+    jpg2png.scan_jpgs : To see where helper function is implemented.
     """
-    if str(file_name).endswith(".jpg"):
+    if str(file_name).lower().endswith(JPG_SUFFIXES):
         return True
     return False
 
 
-def is_file_jpg(path_to_dir: str):
+def _is_excluded(rel_path, exclude):
+    """Helper function that matches a path against exclude glob patterns.
+
+    Parameters
+    ----------
+    rel_path : str
+        The 'rel_path' is the posix path relative to the source directory.
+
+    exclude : list
+        The 'exclude' is a list of glob patterns e.g. ['*_thumb.jpg', 'raw'].
+
+    Returns
+    -------
+    bool
+        If either 'rel_path' or its last part matches a pattern.
+    """
+    name = rel_path.rsplit("/", 1)[-1]
+    return any(fnmatch(rel_path, pattern) or fnmatch(name, pattern)
+               for pattern in exclude)
+
+
+def scan_jpgs(root_dir, recursive=False, exclude=None):
+    """
+    The generator walks a directory with os.scandir and yields jpg-files.
+
+    Parameters
+    ----------
+    root_dir : pathlib.Path
+        The 'root_dir' is the source directory with jpg-files.
+
+    recursive : bool(optional)
+        If 'recursive' is True all subdirectories are searched as well.
+        Symbolic links to directories are not followed.
+
+    exclude : list(optional)
+        The 'exclude' is a list of glob patterns. Matching files are skipped
+        and matching directories are not entered.
+
+    Yields
+    ------
+    pathlib.Path
+        The path to each jpg-file, as soon as it is found. No full listing
+        of the directory tree is built.
+
+    See Also
+    --------
+    os.scandir : For more information about directory entries.
+    """
+    exclude = exclude or []
+    stack = [(str(root_dir), "")]
+    while stack:
+        dir_path, rel_dir = stack.pop()
+        try:
+            entries = scandir(dir_path)
+        except OSError as error:
+            print(f"Could not read directory {dir_path}: {error}")
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                if exclude and _is_excluded(rel_path, exclude):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append((entry.path, rel_path + "/"))
+                    elif _filter_jpg(entry.name) and entry.is_file():
+                        yield Path(entry.path)
+                except OSError as error:
+                    print(f"Could not read {entry.path}: {error}")
+
+
+def is_file_jpg(path_to_dir: str, recursive=False, exclude=None):
     """
-    The function loops through a directory in search of jpg-file.
+    The function searches a directory for jpg-files.
 
     Parameters
     ----------
@@ -105,11 +303,19 @@ def is_file_jpg(path_to_dir: str):
         The 'path_to_dir' parameter is the relative or absolute path to a
         source directory with jpg-files.
 
+    recursive : bool(optional)
+        If 'recursive' is True subdirectories are searched as well.
+
+    exclude : list(optional)
+        The 'exclude' is a list of glob patterns of files and directories
+        to skip.
+
     Returns
     -------
     all_jpgs
-        The return value 'all_jpgs' is a list object with items, where each
-        item points to a file that ends with '.jpg'.
+        The return value 'all_jpgs' is an iterator over pathlib.Path items,
+        where each item points to a jpg-file. The directory is scanned
+        lazily while 'all_jpgs' is consumed.
     bool
         Otherwise the return values is 'bool' set to 'False'.
 
@@ -120,12 +326,19 @@ def is_file_jpg(path_to_dir: str):
 
     AttributeError
         If path to directory is invalid or faulty.
+
+    See Also
+    --------
+    scan_jpgs : For more information about the directory search.
     """
 
     dir_path = is_dir(dir_name=path_to_dir)
     try:
-        jpgs = filter(_filter_jpg, dir_path.iterdir())
-        if not jpgs:
+        if not dir_path:
+            raise AttributeError("Path of directory was invalid")
+        jpgs = scan_jpgs(dir_path, recursive=recursive, exclude=exclude)
+        first_jpg = next(jpgs, None)
+        if first_jpg is None:
             raise AssertionError("No jpgs were found in directory")
     except AttributeError:
         print("Path of directory was invalid")
@@ -135,42 +348,45 @@ def is_file_jpg(path_to_dir: str):
         return False
 
     else:
-        all_jpgs = [pic for pic in jpgs]
+        all_jpgs = chain([first_jpg], jpgs)
         return all_jpgs
 
 
-def load_jpgs(file_paths_to_jpg: list):
+def load_jpgs(file_paths_to_jpg):
     """
-    The function loads jpg-files to PIL.Image object.
+    The generator loads jpg-files to PIL.Image object one at a time.
     Parameters
     ----------
-    file_paths_to_jpg : list
-        The 'file_paths_to_jpg' is list populated with strings that point to
-        jpg-files.
+    file_paths_to_jpg : iterable
+        The 'file_paths_to_jpg' is an iterable populated with pathlib.Path
+        objects that point to jpg-files.
 
-    Returns
-    -------
-    jpg_images
-        The return value 'jpg_images' is list populated with
-        PIL.Image.open(item).
+    Yields
+    ------
+    jpg_path, pic : tuple(pathlib.Path, PIL.Image)
+        The 'pic' is opened from 'jpg_path' and closed again as soon as the
+        next item is requested, so only one file is open at a time.
 
     Raises
     ------
     AttributeError
-        If 'file_paths_to_jpgs' is not a proper pathlib.Path object.
-        Return value is set to False.
+        If an item is not a proper pathlib.Path object. The item is skipped.
+
+    OSError
+        If an item cannot be opened as an image. The item is skipped.
 
     """
-    img = Image
-    try:
-        file_paths_to_jpg[0].is_file()
-    except AttributeError as error:
-        print(f"Missing jpg: {error}")
-        return False
-    else:
-        jpg_images = [img.open(pic_name.absolute()) for pic_name in
-                      file_paths_to_jpg]
-        return jpg_images
+    for jpg_path in file_paths_to_jpg:
+        try:
+            pic = Image.open(jpg_path.absolute())
+        except AttributeError as error:
+            print(f"Missing jpg: {error}")
+            continue
+        except OSError as error:
+            print(f"Could not open {jpg_path}: {error}")
+            continue
+        with pic:
+            yield jpg_path, pic
 
 
 def make_dir(path_to_dir: str):
@@ -216,83 +432,2202 @@ def make_dir(path_to_dir: str):
         return new_dir
 
 
-def jpg2png(path_to_jpgs: list, new_location: str):
+def _stem_clashes(jpg_dir):
+    """Helper function that finds the stems shared by several jpg-files.
+
+    Parameters
+    ----------
+    jpg_dir : pathlib.Path
+        The 'jpg_dir' is the directory of the jpg-files.
+
+    Returns
+    -------
+    set
+        The stems, in lower case, of the jpg-files in 'jpg_dir' that have
+        the same stem as another jpg-file there, e.g. 'a' for 'a.jpeg' and
+        'a.JPG'. Empty if 'jpg_dir' cannot be read.
     """
-    This function takes a jpg-file and converts it to png.
+    stems = set()
+    clashes = set()
+    try:
+        with scandir(jpg_dir) as entries:
+            for entry in entries:
+                if _filter_jpg(entry.name) and entry.is_file():
+                    stem = PurePath(entry.name).stem.casefold()
+                    if stem in stems:
+                        clashes.add(stem)
+                    stems.add(stem)
+    except OSError:
+        pass
+    return clashes
+
+
+def _png_path(jpg_path, new_dir, source_root=None, full_name=False):
+    """Helper function that names the png-file of a jpg-file.
+
     Parameters
     ----------
-    path_to_jpgs : list
-        The 'path_to_jpgs' are the absolute or relative path to a jpg-file
-        from current working directory (cwd). The 'path_to_jpgs' is a list
-        object with items that are str that lead to a single jpg-file.
+    jpg_path : pathlib.Path
+        The 'jpg_path' is the path to the source jpg-file.
 
-    new_location: str
-        The 'new_location' is the relative or absolute path from cwd to a
-        nonexistent directory.
+    new_dir : pathlib.Path
+        The 'new_dir' is the directory where the png-file is stored.
+
+    source_root : pathlib.Path(optional)
+        If 'source_root' is given the subdirectories of 'jpg_path' below
+        'source_root' are mirrored inside 'new_dir'.
+
+    full_name : bool(optional)
+        If 'full_name' is True the jpg suffix is kept, 'a.jpeg.png'.
 
     Returns
     -------
-    converted
-        If jpgs-files are converted, return value 'converted' is set to True.
-    Bool
-        If jpgs-file are not converted. The value is set to False.
+    pathlib.Path
+        The path to the png-file inside 'new_dir', e.g. 'a.png'.
+    """
+    if full_name:
+        png_name = jpg_path.name + ".png"
+    else:
+        png_name = jpg_path.with_suffix(".png").name
+
+    if source_root is None:
+        return new_dir.joinpath(png_name)
+    return new_dir.joinpath(
+        jpg_path.relative_to(source_root)).with_name(png_name)
+
+
+def _claim_pngs(path_to_jpgs, new_dir, source_root=None, png_paths=None,
+                clashes=None):
+    """Helper generator that names the png-file of each jpg-file once.
+
+    Parameters
+    ----------
+    path_to_jpgs : iterable
+        The 'path_to_jpgs' are pathlib.Path items of jpg-files.
+
+    new_dir, source_root : pathlib.Path
+        See '_png_path'. The subdirectories are created inside 'new_dir'.
 
+    png_paths : dict(optional)
+        The 'png_paths' is filled with each yielded jpg-file mapped to its
+        png-file, so later steps do not name it again.
+
+    clashes : dict(optional)
+        The 'clashes' is filled with each skipped jpg-file mapped to False.
+
+    Yields
+    ------
+    pathlib.Path
+        The jpg-files of 'path_to_jpgs'. Jpg-files of one directory that
+        share a stem in any letter case, e.g. 'a.jpeg' and 'a.JPG', all
+        keep their suffix, 'a.jpeg.png' and 'a.JPG.png', whatever the order
+        and the file system. A jpg-file is only skipped if an earlier one
+        of another directory has the same png-file, since two writes of
+        one png-file would race in the pool.
+    """
+    stem_clashes = {}
+    claimed = set()
+    made_dirs = {new_dir}
+    for jpg_path in path_to_jpgs:
+        jpg_dir = jpg_path.parent
+        if jpg_dir not in stem_clashes:
+            stem_clashes[jpg_dir] = _stem_clashes(jpg_dir)
+        full_name = jpg_path.stem.casefold() in stem_clashes[jpg_dir]
+        png_path = _png_path(jpg_path, new_dir, source_root, full_name)
+        if png_path in claimed:
+            print(f"Skipped {jpg_path}, {png_path.name} is already written "
+                  f"by another jpg-file")
+            if clashes is not None:
+                clashes[jpg_path] = False
+            continue
+        claimed.add(png_path)
+        if png_path.parent not in made_dirs:
+            png_path.parent.mkdir(parents=True, exist_ok=True)
+            made_dirs.add(png_path.parent)
+        if png_paths is not None:
+            png_paths[jpg_path] = png_path
+        yield jpg_path
+
+
+def _file_hash(jpg_path):
+    """Helper function that hashes the content of a file.
+
+    Parameters
+    ----------
+    jpg_path : pathlib.Path
+        The 'jpg_path' is the path to the file.
+
+    Returns
+    -------
+    str
+        The sha256 hex digest of the file content.
+    """
+    digest = sha256()
+    with open(jpg_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _skip_failed(jpg_path, error, failed=None):
+    """Helper function that reports a jpg-file that could not be read.
+
+    Parameters
+    ----------
+    jpg_path : pathlib.Path
+        The 'jpg_path' is the path to the jpg-file.
+
+    error : OSError
+        The 'error' raised while reading 'jpg_path'.
+
+    failed : dict(optional)
+        The 'failed' is updated with 'jpg_path' mapped to False.
+    """
+    print(f"Could not convert {jpg_path}: {error}")
+    if failed is not None:
+        failed[jpg_path] = False
+
+
+def load_manifest(new_dir, name=MANIFEST_NAME):
+    """
+    The function loads the conversion manifest of a target directory.
+
+    Parameters
+    ----------
+    new_dir : pathlib.Path
+        The 'new_dir' is the target directory of an earlier run.
+
+    name : str(optional)
+        The 'name' of the json-file, e.g. 'HASH_CACHE_NAME'.
+
+    Returns
+    -------
+    manifest : dict
+        The 'manifest' maps source paths to their size, mtime, optional
+        content hash and the png-file relative to 'new_dir'. The 'manifest'
+        is empty if no earlier run was recorded.
+
+    Raises
+    ------
+    ValueError
+        If the manifest file is corrupt. An empty manifest is returned.
     """
-    new_dir = make_dir(new_location)
     try:
-        png_name = [new_dir.joinpath(pic.name.replace(".jpg", ".png"))
-                    for pic in path_to_jpgs]
-    except (TypeError, AttributeError):
-        return new_dir
+        with open(new_dir / name) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as error:
+        print(f"Manifest was corrupt, converting everything: {error}")
+        return {}
     else:
-        jpgs = load_jpgs(file_paths_to_jpg=path_to_jpgs)
+        return manifest
 
-        png_pics = [pic.save(png_name[i], "png") for i, pic in enumerate(
-                jpgs)]
-        converted = all([True for pic in png_pics if pic is None])
-        return converted
 
-
-def main(root_dir, new_dir):
+def save_manifest(new_dir, manifest, name=MANIFEST_NAME):
     """
-    The recipe function  for conversion of jpgs to pngs.
+    The function writes the conversion manifest to a target directory.
 
     Parameters
     ----------
-    root_dir : str
-        The 'root_dir' relative or absolute from cwd to source directory with
-        jpgs files.
+    new_dir : pathlib.Path
+        The 'new_dir' is the target directory.
 
-    new_dir: str
-        The 'new_dir' the location from cwd to new directory.
+    manifest : dict
+        The 'manifest' as returned by 'load_manifest'.
+
+    name : str(optional)
+        The 'name' of the json-file.
 
     Returns
     -------
     None
+        The manifest is written to a temporary file first and then moved in
+        place, so an interrupted run never leaves a broken manifest.
+    """
+    tmp_file = new_dir / (name + ".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(manifest, f)
+    tmp_file.replace(new_dir / name)
 
-    See Also
-    --------
-    jpg2png : For more information of expected outcomes.
 
+def _changed_jpgs(path_to_jpgs, manifest, new_dir, png_paths,
+                  use_hash=False, signatures=None, settings=None,
+                  failed=None):
+    """Helper generator that skips jpg-files that are already converted.
+
+    Parameters
+    ----------
+    path_to_jpgs : iterable
+        The 'path_to_jpgs' are pathlib.Path items of jpg-files.
+
+    manifest : dict
+        The 'manifest' of the target directory, see 'load_manifest'.
+
+    new_dir : pathlib.Path
+        The 'new_dir' is the target directory.
+
+    png_paths : dict
+        The 'png_paths' as filled by '_claim_pngs'.
+
+    use_hash : bool(optional)
+        If 'use_hash' is True a file whose size or mtime changed is still
+        skipped when its content hash is unchanged.
+
+    signatures : dict(optional)
+        The 'signatures' is filled with the new manifest entry of every
+        yielded jpg-file.
+
+    settings : str(optional)
+        The 'settings' are the encoder settings of this run, e.g.
+        'balanced|None|0.5'. They are stored in each manifest entry.
+
+    failed : dict(optional)
+        The 'failed' is filled with each jpg-file that could not be read,
+        e.g. deleted meanwhile, mapped to False.
+
+    Yields
+    ------
+    pathlib.Path
+        The jpg-files that are new or changed since the last run, whose
+        png-file is missing or that were converted with other 'settings'.
     """
-    all_jpgs = is_file_jpg(root_dir)
-    if all_jpgs:
-        all_png = jpg2png(path_to_jpgs=all_jpgs, new_location=new_dir)
-        return all_png
+    skipped = 0
+    for jpg_path in path_to_jpgs:
+        try:
+            stat = jpg_path.stat()
+        except OSError as error:
+            _skip_failed(jpg_path, error, failed)
+            continue
+        png_path = png_paths[jpg_path]
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                 "png": str(png_path.relative_to(new_dir)),
+                 "settings": settings}
+        old_entry = manifest.get(str(jpg_path))
+        current = old_entry and old_entry.get("png") == entry["png"] and \
+            old_entry.get("settings") == settings and png_path.exists()
+
+        if current and old_entry.get("size") == entry["size"] and \
+                old_entry.get("mtime_ns") == entry["mtime_ns"]:
+            skipped += 1
+            continue
+        if use_hash:
+            try:
+                entry["sha256"] = _file_hash(jpg_path)
+            except OSError as error:
+                _skip_failed(jpg_path, error, failed)
+                continue
+            if current and old_entry.get("sha256") == entry["sha256"]:
+                manifest[str(jpg_path)] = entry
+                skipped += 1
+                continue
+
+        if signatures is not None:
+            signatures[jpg_path] = entry
+        yield jpg_path
+
+    if skipped:
+        print(f"Skipped {skipped} unchanged jpg-files")
+
+
+def prune_manifest(new_dir, manifest):
+    """
+    The function removes png-files whose source jpg-file was deleted.
+
+    Parameters
+    ----------
+    new_dir : pathlib.Path
+        The 'new_dir' is the target directory.
+
+    manifest : dict
+        The 'manifest' of the target directory. Pruned entries are removed.
+
+    Returns
+    -------
+    pruned : list
+        The 'pruned' is a list of the removed png-files.
+    """
+    pruned = []
+    for source in list(manifest):
+        if Path(source).exists():
+            continue
+        png_path = new_dir / manifest.pop(source)["png"]
+        png_path.unlink(missing_ok=True)
+        pruned.append(png_path)
+    if pruned:
+        print(f"Pruned {len(pruned)} png-files without source")
+    return pruned
+
+
+def _write_png(png_path, png_data):
+    """Helper function that writes png-data to a new file.
+
+    An existing png-file is unlinked first, so other hardlinks to it, made
+    by the dedup mode, keep their content.
+
+    Parameters
+    ----------
+    png_path : pathlib.Path
+        The 'png_path' is the png-file that is written.
+
+    png_data : bytes
+        The 'png_data' is the encoded png.
+    """
+    png_path.unlink(missing_ok=True)
+    png_path.write_bytes(png_data)
+
+
+def _link_png(png_source, png_path):
+    """Helper function that hardlinks, or copies, a converted png-file.
+
+    Parameters
+    ----------
+    png_source : pathlib.Path
+        The 'png_source' is an already converted png-file.
+
+    png_path : pathlib.Path
+        The 'png_path' is the new name of the png-file.
+
+    Returns
+    -------
+    bool
+        If the png-file was linked or copied the value is set to 'True',
+        otherwise 'False'.
+
+    Raises
+    ------
+    OSError
+        If hardlinking fails, e.g. across file systems, the file is copied.
+    """
+    if png_source == png_path:
+        return True
+    try:
+        png_path.unlink(missing_ok=True)
+        try:
+            link(png_source, png_path)
+        except OSError:
+            copyfile(png_source, png_path)
+    except OSError as error:
+        print(f"Could not link {png_source} to {png_path}: {error}")
+        return False
     else:
-        return all_jpgs
+        return True
 
 
-if __name__ == "__main__":
-    dir_names = ArgumentParser(description="The directory names for jpg2png "
-                                           "conversion")
-    dir_names.add_argument(
-        "source_dir", type=str, nargs="?", default=str(Path.cwd().absolute()),
-        help="The path to the directory with jpg-files")
-    dir_names.add_argument(
-        "target_dir", type=str, nargs="?", default="./new_pngs",
-        help="The directory path to store converted jpg-files")
+def _unique_jpgs(path_to_jpgs, hash_cache, new_dir, png_paths,
+                 hashes=None, duplicates=None, linked=None, signatures=None,
+                 failed=None):
+    """Helper generator that yields each distinct jpg payload only once.
+
+    Parameters
+    ----------
+    path_to_jpgs : iterable
+        The 'path_to_jpgs' are pathlib.Path items of jpg-files.
+
+    hash_cache : dict
+        The 'hash_cache' maps a content hash to the png-file converted from
+        it in an earlier run, with its size and mtime.
+
+    new_dir : pathlib.Path
+        The 'new_dir' is the target directory.
+
+    png_paths : dict
+        The 'png_paths' as filled by '_claim_pngs'.
+
+    hashes : dict(optional)
+        The 'hashes' is filled with the content hash of each yielded file.
+
+    duplicates : dict(optional)
+        The 'duplicates' is filled with content hash -> list of (jpg_path,
+        png_path) of copies seen while the first one is still converting.
+
+    linked : dict(optional)
+        The 'linked' is filled with jpg_path -> bool for copies that were
+        linked to a png-file from 'hash_cache'.
+
+    signatures : dict(optional)
+        The 'signatures' of '_changed_jpgs', to reuse hashes it computed.
+
+    failed : dict(optional)
+        The 'failed' is filled with each jpg-file that could not be read,
+        mapped to False.
+
+    Yields
+    ------
+    pathlib.Path
+        The jpg-files whose content was not converted before.
+    """
+    signatures = signatures or {}
+    for jpg_path in path_to_jpgs:
+        try:
+            digest = signatures.get(jpg_path, {}).get("sha256") or \
+                _file_hash(jpg_path)
+        except OSError as error:
+            _skip_failed(jpg_path, error, failed)
+            continue
+        png_path = png_paths[jpg_path]
+
+        if digest in duplicates:
+            duplicates[digest].append((jpg_path, png_path))
+            continue
+
+        cached = hash_cache.get(digest)
+        if cached:
+            png_source = new_dir / cached["png"]
+            try:
+                stat = png_source.stat()
+            except OSError:
+                stat = None
+            if stat and stat.st_size == cached["size"] and \
+                    stat.st_mtime_ns == cached["mtime_ns"]:
+                linked[jpg_path] = _link_png(png_source, png_path)
+                continue
+            del hash_cache[digest]
+
+        hashes[jpg_path] = digest
+        duplicates[digest] = []
+        yield jpg_path
+
+
+def _link_duplicates(converted, hashes, duplicates, hash_cache, new_dir,
+                     png_paths):
+    """Helper function that links copies to their converted png-file.
+
+    Parameters
+    ----------
+    converted : dict
+        The 'converted' results of the unique jpg-files.
+
+    hashes, duplicates : dict
+        As filled by '_unique_jpgs'.
+
+    hash_cache : dict
+        The 'hash_cache' is updated with the png-file of each converted
+        content hash.
+
+    new_dir : pathlib.Path
+        The 'new_dir' is the target directory.
+
+    png_paths : dict
+        The 'png_paths' as filled by '_claim_pngs'.
+
+    Returns
+    -------
+    linked : dict
+        The 'linked' maps each copy to 'True' if it got its png-file,
+        otherwise 'False'.
+    """
+    linked = {}
+    for jpg_path, png_pic in converted.items():
+        digest = hashes.get(jpg_path)
+        if digest is None:
+            continue
+        copies = duplicates.pop(digest, [])
+        if not png_pic:
+            linked.update((copy, False) for copy, _ in copies)
+            continue
+
+        png_source = png_paths[jpg_path]
+        stat = png_source.stat()
+        hash_cache[digest] = {"png": str(png_source.relative_to(new_dir)),
+                              "size": stat.st_size,
+                              "mtime_ns": stat.st_mtime_ns}
+        for copy, png_path in copies:
+            linked[copy] = _link_png(png_source, png_path)
+    return linked
+
+
+def _bounded_map(pool, func, *iterables, window=64):
+    """Helper generator that maps 'func' over a pool with bounded backlog.
+
+    Unlike 'Executor.map' the iterables are consumed lazily and at most
+    'window' tasks are in flight at any time.
+
+    Parameters
+    ----------
+    pool : concurrent.futures.Executor
+        The 'pool' that runs the tasks.
+
+    func : callable
+        The 'func' applied to each item of 'iterables'.
+
+    *iterables : iterable
+        The arguments of 'func', zipped together.
+
+    window : int(optional)
+        The 'window' is the maximum number of pending tasks.
+
+    Yields
+    ------
+    result
+        The results of 'func' in the order of 'iterables'.
+    """
+    pending = deque()
+    for args in zip(*iterables):
+        pending.append(pool.submit(func, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _parse_size(size_text):
+    """Helper function that parses a 'WxH' string to a size tuple.
+
+    Parameters
+    ----------
+    size_text : str
+        The 'size_text' is a size like '640x480'.
+
+    Returns
+    -------
+    tuple(int, int)
+        The width and height.
+
+    Raises
+    ------
+    ValueError
+        If 'size_text' is not two positive integers separated by 'x'.
+    """
+    width, height = (int(i) for i in size_text.lower().split("x"))
+    if width < 1 or height < 1:
+        raise ValueError(f"Size must be positive: {size_text}")
+    return width, height
+
+
+def _reduce(pic, max_size=None, scale=None):
+    """Helper function that decodes a jpg at reduced resolution.
+
+    JPEG-files are decoded with PIL.Image.draft, which lets the decoder
+    scale down by 1/2, 1/4 or 1/8 while decoding. The result is then
+    resized to the exact target size.
+
+    Parameters
+    ----------
+    pic : PIL.Image
+        The 'pic' is an opened, not yet loaded, image.
+
+    max_size : tuple(int, int)(optional)
+        The 'max_size' is the bounding box of the png. The aspect ratio is
+        kept and images are never enlarged.
+
+    scale : float(optional)
+        The 'scale' is the factor applied to both width and height.
+
+    Returns
+    -------
+    pic : PIL.Image
+        The decoded image, reduced in size if requested.
+
+    See Also
+    --------
+    PIL.Image.Image.draft : For more information about reduced decoding.
+    """
+    if not max_size and not scale:
+        pic.load()
+        return pic
+
+    width, height = pic.size
+    ratio = scale or 1.0
+    if max_size:
+        ratio = min(ratio, max_size[0] / width, max_size[1] / height)
+    target = (max(1, round(width * ratio)), max(1, round(height * ratio)))
+
+    if pic.format == "JPEG":
+        pic.draft(pic.mode, target)
+    pic.load()
+    if pic.size != target:
+        pic = pic.resize(target, Image.LANCZOS)
+    return pic
+
+
+def _check_options(profile, scale):
+    """Helper function that validates the encoder settings.
+
+    Parameters
+    ----------
+    profile : str
+        The 'profile' must be a key of 'PNG_PROFILES'.
+
+    scale : float
+        The 'scale' must be None or in the range (0, 1].
+
+    Raises
+    ------
+    ValueError
+        If 'profile' or 'scale' is invalid.
+    """
+    if profile not in PNG_PROFILES:
+        raise ValueError(f"Unknown profile '{profile}', "
+                         f"choose from {list(PNG_PROFILES)}")
+    if scale is not None and not 0 < scale <= 1:
+        raise ValueError(f"Scale must be in the range (0, 1]: {scale}")
+
+
+def _encode_png(jpg_file, profile="balanced", max_size=None, scale=None):
+    """Helper function that converts a jpg to png-data in memory.
+
+    Parameters
+    ----------
+    jpg_file : pathlib.Path or file-like
+        The 'jpg_file' is the path to, or the open binary file of, a jpg.
+
+    profile : str(optional)
+        The 'profile' is a key of 'PNG_PROFILES'.
+
+    max_size : tuple(int, int)(optional)
+        The 'max_size' is the bounding box of the png, see '_reduce'.
+
+    scale : float(optional)
+        The 'scale' is the size factor of the png, see '_reduce'.
+
+    Returns
+    -------
+    png_data, timings : tuple(bytes, dict)
+        The 'png_data' is the encoded png. The 'timings' holds the seconds
+        spent on jpg decoding and png encoding, keyed 'decode' and 'encode'.
+
+    Raises
+    ------
+    OSError
+        If 'jpg_file' cannot be read or decoded.
+    """
+    png_file = BytesIO()
+    start = perf_counter()
+    with Image.open(jpg_file) as pic:
+        pic = _reduce(pic, max_size, scale)
+        decoded = perf_counter()
+        pic.save(png_file, "png", **PNG_PROFILES[profile])
+    timings = {"decode": decoded - start, "encode": perf_counter() - decoded}
+    return png_file.getvalue(), timings
+
+
+def _file_stats(read_time=0.0, timings=None, write_time=0.0, bytes_in=0,
+                bytes_out=0, error=None):
+    """Helper function that builds the statistics of one converted file.
+
+    Parameters
+    ----------
+    read_time, write_time : float(optional)
+        The seconds spent reading the jpg-file and writing the png-file.
+
+    timings : dict(optional)
+        The 'timings' of '_encode_png'.
+
+    bytes_in, bytes_out : int(optional)
+        The size of the jpg-file and of the png-file.
+
+    error : Exception(optional)
+        The 'error' that stopped the conversion.
+
+    Returns
+    -------
+    stats : dict
+        The 'stats' with the seconds of each stage, the bytes in and out,
+        and the error reason as 'ErrorType: message', or None.
+    """
+    timings = timings or {}
+    return {
+        "read": read_time,
+        "decode": timings.get("decode", 0.0),
+        "encode": timings.get("encode", 0.0),
+        "write": write_time,
+        "bytes_in": bytes_in,
+        "bytes_out": bytes_out,
+        "error": f"{type(error).__name__}: {error}" if error else None,
+    }
+
+
+def _convert_jpg(jpg_path, png_path, profile="balanced", max_size=None,
+                 scale=None):
+    """Helper function that converts a single jpg-file to a png-file.
+
+    Parameters
+    ----------
+    jpg_path : pathlib.Path
+        The 'jpg_path' is the path to the source jpg-file.
+
+    png_path : pathlib.Path
+        The 'png_path' is the path to the png-file that is created.
+
+    profile, max_size, scale : optional
+        The encoder settings, see '_encode_png'.
+
+    Returns
+    -------
+    png_pic, stats : tuple(bool, dict)
+        The 'png_pic' is set to 'True' if the png-file was saved, otherwise
+        'False'. The 'stats' are the timings and sizes, see '_file_stats'.
+
+    See Also
+    --------
+    jpg2png.jpg2png : To see where helper function is implemented.
+    """
+    start = perf_counter()
+    jpg_data = b""
+    try:
+        jpg_data = jpg_path.read_bytes()
+        read_time = perf_counter() - start
+        png_data, timings = _encode_png(BytesIO(jpg_data), profile,
+                                        max_size, scale)
+        start = perf_counter()
+        _write_png(png_path, png_data)
+    except DECODE_ERRORS as error:
+        print(f"Could not convert {jpg_path}: {error}")
+        return False, _file_stats(bytes_in=len(jpg_data), error=error)
+    else:
+        return True, _file_stats(read_time, timings, perf_counter() - start,
+                                 len(jpg_data), len(png_data))
+
+
+def _pipeline_map(jpg_pairs, encode, workers=None, readers=2, writers=2,
+                  stage_depth=8, pool=None):
+    """Helper generator that converts jpg-files in overlapping stages.
+
+    Reader threads prefetch jpg-bytes from disk, 'encode' decodes and
+    encodes them in a pool of 'workers' processes and writer threads flush
+    the png-data to disk. The stages are connected by bounded queues, so
+    slow storage and slow encoding no longer wait on each other.
+
+    Parameters
+    ----------
+    jpg_pairs : iterable
+        The 'jpg_pairs' are (jpg_path, png_path) tuples, consumed lazily.
+
+    encode : callable
+        The 'encode' takes jpg-bytes and returns (png_data, timings), see
+        '_encode_png'.
+
+    workers : int(optional)
+        The 'workers' is the number of encoding processes. If None or 1 the
+        encoding runs in a single thread.
+
+    readers : int(optional)
+        The 'readers' is the number of reader threads.
+
+    writers : int(optional)
+        The 'writers' is the number of writer threads.
+
+    stage_depth : int(optional)
+        The 'stage_depth' is the size of each queue between two stages.
+
+    pool : concurrent.futures.Executor(optional)
+        The 'pool' is an already running pool used for encoding instead of
+        creating one. It is not shut down afterwards.
+
+    Yields
+    ------
+    jpg_path, result : tuple(pathlib.Path, tuple)
+        The 'result' is the same as returned by '_convert_jpg'. The files
+        are yielded in order of completion.
+
+    Raises
+    ------
+    Exception
+        Any error raised while iterating 'jpg_pairs', or while converting a
+        file other than 'DECODE_ERRORS', is raised again once the pipeline
+        is drained.
+    """
+    read_queue = Queue(stage_depth)
+    encode_queue = Queue(stage_depth)
+    write_queue = Queue(stage_depth)
+    done_queue = Queue()
+    errors = []
+
+    def feed():
+        try:
+            for pair in jpg_pairs:
+                read_queue.put(pair)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            for _ in range(readers):
+                read_queue.put(None)
+
+    def read():
+        for jpg_path, png_path in iter(read_queue.get, None):
+            start = perf_counter()
+            try:
+                jpg_data = jpg_path.read_bytes()
+            except OSError as error:
+                jpg_data = error
+            encode_queue.put((jpg_path, png_path, jpg_data,
+                              perf_counter() - start))
+        encode_queue.put(None)
+
+    def dispatch(pool):
+        stopped = 0
+        while stopped < readers:
+            item = encode_queue.get()
+            if item is None:
+                stopped += 1
+                continue
+            jpg_path, png_path, jpg_data, read_time = item
+            future = jpg_data
+            if not isinstance(jpg_data, Exception):
+                future = pool.submit(encode, BytesIO(jpg_data))
+            write_queue.put((jpg_path, png_path, future, read_time,
+                             len(jpg_data) if future is not jpg_data else 0))
+        for _ in range(writers):
+            write_queue.put(None)
+
+    def write():
+        for item in iter(write_queue.get, None):
+            jpg_path, png_path, future, read_time, bytes_in = item
+            try:
+                if isinstance(future, Exception):
+                    raise future
+                png_data, timings = future.result()
+                start = perf_counter()
+                _write_png(png_path, png_data)
+            except DECODE_ERRORS as error:
+                print(f"Could not convert {jpg_path}: {error}")
+                stats = _file_stats(read_time, bytes_in=bytes_in, error=error)
+                done_queue.put((jpg_path, (False, stats)))
+            except Exception as error:
+                # Raised after draining, a dead writer would hang the run.
+                errors.append(error)
+            else:
+                stats = _file_stats(read_time, timings,
+                                    perf_counter() - start, bytes_in,
+                                    len(png_data))
+                done_queue.put((jpg_path, (True, stats)))
+        done_queue.put(None)
+
+    if pool is not None:
+        pool_context = nullcontext(pool)
+    elif workers and workers > 1:
+        pool_context = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool_context = ThreadPoolExecutor(max_workers=1)
+
+    with pool_context as pool:
+        threads = [Thread(target=feed), Thread(target=dispatch, args=(pool,))]
+        threads += [Thread(target=read) for _ in range(readers)]
+        threads += [Thread(target=write) for _ in range(writers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        stopped = 0
+        while stopped < writers:
+            item = done_queue.get()
+            if item is None:
+                stopped += 1
+            else:
+                yield item
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+
+def _decoded_bytes(jpg_path):
+    """Helper function that estimates the memory of a decoded image.
+
+    Only the image header is read, the image is not decoded.
+
+    Parameters
+    ----------
+    jpg_path : pathlib.Path
+        The 'jpg_path' is the path to the jpg-file.
+
+    Returns
+    -------
+    int
+        The width times height times number of bands of the image, or 0 if
+        the header cannot be read or the image is above the pixel limit of
+        'DECODE_ERRORS'. Such files are reported 'False' when converted.
+    """
+    try:
+        with Image.open(jpg_path) as pic:
+            return pic.width * pic.height * len(pic.getbands())
+    except DECODE_ERRORS:
+        return 0
+
+
+def _scheduled_map(pool, convert, jpg_pairs, workers, budget=None):
+    """Helper generator that converts the largest images first.
+
+    The image sizes are read from the headers up front. Each free worker
+    gets the largest image that still fits in 'budget' next to the images
+    that are being converted, so giant images start early instead of
+    being the tail of a run, and never run together beyond the budget.
+
+    Parameters
+    ----------
+    pool : concurrent.futures.Executor
+        The 'pool' that runs the conversions.
+
+    convert : callable
+        The 'convert' takes (jpg_path, png_path), see '_convert_jpg'.
+
+    jpg_pairs : iterable
+        The 'jpg_pairs' are (jpg_path, png_path) tuples.
+
+    workers : int
+        The 'workers' is the number of conversions run at once.
+
+    budget : float(optional)
+        The 'budget' is the maximum bytes of decoded images at once. An
+        image larger than 'budget' is converted alone.
+
+    Yields
+    ------
+    jpg_path, result : tuple(pathlib.Path, tuple)
+        The 'result' of 'convert', in order of completion.
+    """
+    pending = sorted((_decoded_bytes(jpg_path), i, jpg_path, png_path)
+                     for i, (jpg_path, png_path) in enumerate(jpg_pairs))
+    sizes = [item[0] for item in pending]
+    running = {}
+    in_use = 0
+
+    while pending or running:
+        while pending and len(running) < workers:
+            index = len(pending) - 1
+            if budget:
+                index = bisect_right(sizes, budget - in_use) - 1
+                if index < 0 and running:
+                    break
+                if index < 0:
+                    index = len(pending) - 1
+            size, _, jpg_path, png_path = pending.pop(index)
+            sizes.pop(index)
+            running[pool.submit(convert, jpg_path, png_path)] = (jpg_path,
+                                                                 size)
+            in_use += size
+
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            jpg_path, size = running.pop(future)
+            in_use -= size
+            yield jpg_path, future.result()
+
+
+def convert_bytes(jpg, profile="balanced", max_size=None, scale=None):
+    """
+    The function converts a jpg to png without touching the file system.
+
+    Parameters
+    ----------
+    jpg : bytes or file-like
+        The 'jpg' is the jpg-data, or a binary file-like object to read it
+        from, e.g. an upload stream.
+
+    profile : str(optional)
+        The 'profile' is the png encoder setting, see 'PNG_PROFILES'.
+
+    max_size : tuple(int, int)(optional)
+        The 'max_size' is the bounding box of the png, see '_reduce'.
+
+    scale : float(optional)
+        The 'scale' is the size factor of the png, see '_reduce'.
+
+    Returns
+    -------
+    png_data : bytes
+        The 'png_data' is the encoded png.
+
+    Raises
+    ------
+    ValueError
+        If 'profile' or 'scale' is invalid.
+
+    OSError
+        If 'jpg' cannot be decoded, e.g. PIL.UnidentifiedImageError.
+
+    PIL.Image.DecompressionBombError
+        If 'jpg' has more than twice PIL.Image.MAX_IMAGE_PIXELS pixels.
+
+    Examples
+    --------
+    >>> png_data = convert_bytes(request.body, max_size=(640, 480))
+    """
+    _check_options(profile, scale)
+    if isinstance(jpg, (bytes, bytearray, memoryview)):
+        jpg = BytesIO(jpg)
+    png_data, _ = _encode_png(jpg, profile, max_size, scale)
+    return png_data
+
+
+def _convert_payload(jpg_data, profile="balanced", max_size=None,
+                     scale=None):
+    """Helper function that converts jpg-data and reports failures.
+
+    Parameters
+    ----------
+    jpg_data : bytes
+        The 'jpg_data' is the jpg to convert.
+
+    profile, max_size, scale : optional
+        The encoder settings, see '_encode_png'.
+
+    Returns
+    -------
+    png_data : bytes
+        The 'png_data' is the encoded png.
+    bool
+        If 'jpg_data' could not be converted the value is set to 'False'.
+
+    See Also
+    --------
+    jpg2png.convert_many : To see where helper function is implemented.
+    """
+    try:
+        png_data, _ = _encode_png(BytesIO(jpg_data), profile, max_size, scale)
+    except DECODE_ERRORS as error:
+        print(f"Could not convert payload: {error}")
+        return False
+    else:
+        return png_data
+
+
+def convert_many(payloads, workers=None, window=None, profile="balanced",
+                 max_size=None, scale=None):
+    """
+    The generator converts a stream of jpgs to pngs in memory.
+
+    Parameters
+    ----------
+    payloads : iterable
+        The 'payloads' are bytes or binary file-like objects, consumed
+        lazily.
+
+    workers : int(optional)
+        The 'workers' is the number of processes used for the conversion.
+        If 'workers' is None or 1 the payloads are converted one after
+        another.
+
+    window : int(optional)
+        The 'window' is the maximum number of payloads queued in the process
+        pool. Default value is four times 'workers'.
+
+    profile, max_size, scale : optional
+        The encoder settings, see 'convert_bytes'.
+
+    Yields
+    ------
+    png_data : bytes
+        The encoded png of each payload, in the order of 'payloads'.
+    bool
+        If a payload could not be converted the value is set to 'False'.
+
+    Raises
+    ------
+    ValueError
+        If 'profile' or 'scale' is invalid.
+    """
+    _check_options(profile, scale)
+    convert = partial(_convert_payload, profile=profile, max_size=max_size,
+                      scale=scale)
+    # File-like objects cannot be sent to worker processes, bytes can.
+    jpgs = (jpg.read() if hasattr(jpg, "read") else bytes(jpg)
+            for jpg in payloads)
+
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from _bounded_map(pool, convert, jpgs,
+                                    window=window or 4 * workers)
+    else:
+        yield from map(convert, jpgs)
+
+
+def _timed_iter(iterable, report, stage):
+    """Helper generator that adds the time spent in 'iterable' to a report.
+
+    Parameters
+    ----------
+    iterable : iterable
+        The 'iterable' is e.g. the lazy directory scan.
+
+    report : dict
+        The 'report' of the run, see '_new_report'.
+
+    stage : str
+        The 'stage' key in report['stages'] that the time is added to.
+
+    Yields
+    ------
+    item
+        The items of 'iterable'.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            report["stages"][stage] += perf_counter() - start
+        yield item
+
+
+def _new_report(profile, per_file=False):
+    """Helper function that creates an empty run report.
+
+    Parameters
+    ----------
+    profile : str
+        The 'profile' used for encoding.
+
+    per_file : bool(optional)
+        If 'per_file' is True the statistics of every file are kept.
+
+    Returns
+    -------
+    report : dict
+        The 'report' with file and byte counts, seconds per stage, error
+        counts per reason and, optionally, a list of per-file statistics.
+    """
+    report = {
+        "profile": profile,
+        "files": 0,
+        "converted": 0,
+        "failed": 0,
+        "bytes_in": 0,
+        "bytes_out": 0,
+        "stages": dict.fromkeys(("discover", "read", "decode", "encode",
+                                 "write"), 0.0),
+        "errors": {},
+        "started": perf_counter(),
+    }
+    if per_file:
+        report["per_file"] = []
+    return report
+
+
+def _print_progress(report, end="\r"):
+    """Helper function that prints a live progress line to stderr.
+
+    Parameters
+    ----------
+    report : dict
+        The 'report' of the run, see '_new_report'.
+
+    end : str(optional)
+        The 'end' of the line. The line overwrites itself unless a newline
+        is given.
+    """
+    seconds = max(perf_counter() - report["started"], 1e-9)
+    print(f"{report['files']} files, {report['files'] / seconds:.1f} files/s, "
+          f"{report['bytes_in'] / 1e6 / seconds:.1f} MB/s in, "
+          f"{report['failed']} errors", end=end, file=stderr, flush=True)
+
+
+def _finish_report(report):
+    """Helper function that turns a run report into json-ready values.
+
+    Parameters
+    ----------
+    report : dict
+        The 'report' of the run, see '_new_report'.
+
+    Returns
+    -------
+    report : dict
+        The same 'report' with 'wall_seconds' and throughput instead of the
+        start time.
+    """
+    seconds = max(perf_counter() - report.pop("started"), 1e-9)
+    report["wall_seconds"] = seconds
+    report["files_per_sec"] = report["files"] / seconds
+    report["mb_per_sec_in"] = report["bytes_in"] / 1e6 / seconds
+    return report
+
+
+def _collect_results(results, profile, report=None, progress=False):
+    """Helper function that gathers the results of '_convert_jpg'.
+
+    Parameters
+    ----------
+    results : iterable
+        The 'results' are (jpg_path, result) tuples, where 'result' is the
+        return value of '_convert_jpg'.
+
+    profile : str
+        The 'profile' used for encoding, see 'PNG_PROFILES'.
+
+    report : dict(optional)
+        The 'report' of the run, see '_new_report'. It is updated with the
+        statistics of every file.
+
+    progress : bool(optional)
+        If 'progress' is True a live progress line is printed to stderr.
+
+    Returns
+    -------
+    converted : dict
+        The 'converted' maps each jpg-file to 'True' or 'False'. The encode
+        time and output bytes of the run are printed.
+    """
+    report = report or _new_report(profile)
+    converted = {}
+    shown = perf_counter()
+    for jpg_path, (png_pic, stats) in results:
+        converted[jpg_path] = png_pic
+        report["files"] += 1
+        report["converted" if png_pic else "failed"] += 1
+        report["bytes_in"] += stats["bytes_in"]
+        report["bytes_out"] += stats["bytes_out"]
+        for stage in ("read", "decode", "encode", "write"):
+            report["stages"][stage] += stats[stage]
+        if stats["error"]:
+            reason = stats["error"].split(":", 1)[0]
+            report["errors"][reason] = report["errors"].get(reason, 0) + 1
+        if "per_file" in report:
+            report["per_file"].append(dict(stats, jpg=str(jpg_path)))
+        if progress and perf_counter() - shown > 0.5:
+            _print_progress(report)
+            shown = perf_counter()
+
+    if progress:
+        _print_progress(report, end="\n")
+    print(f"Profile '{profile}': {report['converted']} png-files, "
+          f"encode {report['stages']['encode']:.3f} s, "
+          f"{report['bytes_out']} bytes")
+    return converted
+
+
+def jpg2png(path_to_jpgs, new_location: str, workers: int = None,
+            window: int = None, source_root=None, incremental=False,
+            use_hash=False, prune=False, profile="balanced", max_size=None,
+            scale=None, pipeline=False, readers=2, writers=2, stage_depth=8,
+            dedup=False, pool=None, report_file=None, progress=False,
+            schedule=False, memory_budget=None):
+    """
+    This function takes a jpg-file and converts it to png.
+    Parameters
+    ----------
+    path_to_jpgs : iterable
+        The 'path_to_jpgs' are the absolute or relative path to a jpg-file
+        from current working directory (cwd). The 'path_to_jpgs' is a list
+        or generator with pathlib.Path items that lead to a single jpg-file.
+        The items are consumed lazily.
+
+    new_location: str
+        The 'new_location' is the relative or absolute path from cwd to a
+        nonexistent directory.
+
+    workers: int(optional)
+        The 'workers' is the number of processes used for the conversion.
+        If 'workers' is None or 1 the files are converted one after another.
+
+    window: int(optional)
+        The 'window' is the maximum number of files queued in the process
+        pool. Default value is four times 'workers'.
+
+    source_root: pathlib.Path(optional)
+        The 'source_root' is the source directory. If given, its directory
+        tree is mirrored inside 'new_location'.
+
+    incremental: bool(optional)
+        If 'incremental' is True only new or changed jpg-files are converted.
+        The state of each run is kept in a manifest inside 'new_location'.
+
+    use_hash: bool(optional)
+        If 'use_hash' is True the manifest also records a content hash, so
+        files that were touched but not changed are not converted again.
+
+    prune: bool(optional)
+        If 'prune' is True png-files whose source jpg-file was deleted are
+        removed. Only applies with 'incremental'.
+
+    profile: str(optional)
+        The 'profile' is the png encoder setting, a key of 'PNG_PROFILES'.
+        Default value is 'balanced', which matches Pillow's default.
+
+    max_size: tuple(int, int)(optional)
+        The 'max_size' is the (width, height) bounding box of the pngs.
+        JPEG-files are decoded at 1/2, 1/4 or 1/8 scale when possible.
+
+    scale: float(optional)
+        The 'scale' is the size factor of the pngs, e.g. 0.25.
+
+    pipeline: bool(optional)
+        If 'pipeline' is True reading, encoding and writing overlap in
+        separate stages, see '_pipeline_map'.
+
+    readers: int(optional)
+        The 'readers' is the number of reader threads of the pipeline.
+
+    writers: int(optional)
+        The 'writers' is the number of writer threads of the pipeline.
+
+    stage_depth: int(optional)
+        The 'stage_depth' is the number of files queued between two stages
+        of the pipeline.
+
+    dedup: bool(optional)
+        If 'dedup' is True byte-identical jpg-files are converted once and
+        the png-file is hardlinked, or copied, to the other names. Content
+        hashes are kept in a cache inside 'new_location', so identical
+        files of later runs are linked as well.
+
+    pool: concurrent.futures.Executor(optional)
+        The 'pool' is an already running process pool to convert with. It
+        is not shut down afterwards, so its workers stay warm.
+
+    report_file: str(optional)
+        The 'report_file' is a path where a json report of the run is
+        written: seconds per stage (discover, read, decode, encode, write),
+        bytes in and out, error counts per reason and per-file statistics.
+
+    progress: bool(optional)
+        If 'progress' is True a live progress and throughput line is
+        printed to stderr.
+
+    schedule: bool(optional)
+        If 'schedule' is True the process pool converts the largest images
+        first, see '_scheduled_map'. The image headers of all files are
+        read before converting.
+
+    memory_budget: float(optional)
+        The 'memory_budget' is the maximum megabytes of decoded images
+        held by all workers at once. Only applies with 'schedule'.
+
+    Returns
+    -------
+    converted : dict
+        The 'converted' maps each jpg-file to 'True' if it was converted to
+        png, otherwise 'False'. Skipped, unchanged jpg-files are left out.
+        The encode time and output bytes of the profile are printed.
+
+    new_dir : pathlib.Path
+        The target directory, if 'path_to_jpgs' is not an iterable of
+        pathlib.Path items. Nothing is converted.
+
+    Raises
+    ------
+    ValueError
+        If 'profile' is not a key of 'PNG_PROFILES' or 'scale' is not in
+        the range (0, 1]. If 'schedule' is used with 'pipeline' or without
+        a process pool, or 'memory_budget' without 'schedule'.
+
+    See Also
+    --------
+    concurrent.futures.ProcessPoolExecutor : For more information about the
+    process pool.
+    load_manifest : For more information about the manifest.
+
+    """
+    _check_options(profile, scale)
+    if schedule and (pipeline or (pool is None and not
+                                  (workers and workers > 1))):
+        raise ValueError("Schedule needs a process pool (workers > 1) "
+                         "and does not apply to the pipeline")
+    if memory_budget is not None and not schedule:
+        raise ValueError("Memory budget only applies with schedule")
+
+    new_dir = make_dir(new_location)
+    if not path_to_jpgs or not new_dir:
+        return new_dir
+
+    # Only paths are converted, checked on the first one to stay lazy.
+    try:
+        path_to_jpgs = iter(path_to_jpgs)
+    except TypeError:
+        return new_dir
+    first_jpg = next(path_to_jpgs, None)
+    if first_jpg is None:
+        return {}
+    if not isinstance(first_jpg, PurePath):
+        return new_dir
+    path_to_jpgs = chain([first_jpg], path_to_jpgs)
+    # Files that are not converted at all, mapped to False.
+    skipped = {}
+    png_paths = {}
+    path_to_jpgs = _claim_pngs(path_to_jpgs, new_dir, source_root, png_paths,
+                               skipped)
+
+    # Outputs of other encoder settings are not reused.
+    settings = f"{profile}|{max_size}|{scale}"
+
+    if incremental:
+        manifest = load_manifest(new_dir)
+        signatures = {}
+        path_to_jpgs = _changed_jpgs(path_to_jpgs, manifest, new_dir,
+                                     png_paths, use_hash, signatures,
+                                     settings, skipped)
+
+    if dedup:
+        hash_caches = load_manifest(new_dir, HASH_CACHE_NAME)
+        hash_cache = hash_caches.setdefault(settings, {})
+        hashes, duplicates, linked = {}, {}, {}
+        path_to_jpgs = _unique_jpgs(
+            path_to_jpgs, hash_cache, new_dir, png_paths, hashes,
+            duplicates, linked, signatures if incremental else None,
+            skipped)
+
+    # The paths are consumed lazily, one file or one window at a time.
+    report = _new_report(profile, per_file=bool(report_file))
+    path_to_jpgs = _timed_iter(path_to_jpgs, report, "discover")
+    jpg_keys, jpg_paths, png_source = tee(path_to_jpgs, 3)
+    png_names = (png_paths[pic] for pic in png_source)
+    convert = partial(_convert_jpg, profile=profile, max_size=max_size,
+                      scale=scale)
+    if pipeline:
+        encode = partial(_encode_png, profile=profile, max_size=max_size,
+                         scale=scale)
+        png_pics = _pipeline_map(zip(jpg_paths, png_names), encode,
+                                 workers, readers, writers, stage_depth, pool)
+        converted = _collect_results(png_pics, profile, report, progress)
+    elif pool is not None or (workers and workers > 1):
+        if pool is not None:
+            pool_context = nullcontext(pool)
+        else:
+            pool_context = ProcessPoolExecutor(max_workers=workers)
+        with pool_context as pool:
+            if schedule:
+                png_pics = _scheduled_map(
+                    pool, convert, zip(jpg_paths, png_names),
+                    workers or 1, memory_budget and memory_budget * 1e6)
+            else:
+                png_pics = zip(jpg_keys, _bounded_map(
+                    pool, convert, jpg_paths, png_names,
+                    window=window or 4 * (workers or 1)))
+            converted = _collect_results(png_pics, profile, report,
+                                         progress)
+    else:
+        png_pics = map(convert, jpg_paths, png_names)
+        converted = _collect_results(zip(jpg_keys, png_pics), profile,
+                                     report, progress)
+
+    converted.update(skipped)
+
+    if dedup:
+        linked.update(_link_duplicates(converted, hashes, duplicates,
+                                       hash_cache, new_dir, png_paths))
+        if linked:
+            print(f"Reused {sum(linked.values())} png-files of identical "
+                  f"jpg-files")
+        converted.update(linked)
+        save_manifest(new_dir, hash_caches, HASH_CACHE_NAME)
+
+    if incremental:
+        for jpg_path, png_pic in converted.items():
+            if png_pic:
+                manifest[str(jpg_path)] = signatures[jpg_path]
+        if prune:
+            prune_manifest(new_dir, manifest)
+        save_manifest(new_dir, manifest)
+
+    if report_file:
+        with open(report_file, "w") as f:
+            json.dump(_finish_report(report), f, indent=2)
+        print(f"Report was written to: {report_file}")
+    return converted
+
+
+def _is_archive(path):
+    """Helper function that determines if a path is a tar or zip archive.
+
+    Parameters
+    ----------
+    path : str
+        The 'path' is a file name.
+
+    Returns
+    -------
+    bool
+        If 'path' ends with one of 'ARCHIVE_SUFFIXES' in any letter case.
+    """
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _archive_jpgs(archive_path, exclude=None):
+    """Helper generator that streams the jpg members of an archive.
+
+    Tar archives, compressed or not, are read as a stream, one member after
+    another. Zip archives are read member by member from their index.
+
+    Parameters
+    ----------
+    archive_path : str
+        The 'archive_path' is a tar or zip archive.
+
+    exclude : list(optional)
+        The 'exclude' is a list of glob patterns of members to skip.
+
+    Yields
+    ------
+    name, jpg_data : tuple(str, bytes)
+        The member 'name' and its content.
+    """
+    exclude = exclude or []
+    if str(archive_path).lower().endswith(".zip"):
+        with ZipFile(archive_path) as archive:
+            for member in archive.infolist():
+                if member.is_dir() or not _filter_jpg(member.filename):
+                    continue
+                if exclude and _is_excluded(member.filename, exclude):
+                    continue
+                yield member.filename, archive.read(member)
+    else:
+        with tarfile.open(archive_path, "r|*") as archive:
+            for member in archive:
+                if not member.isfile() or not _filter_jpg(member.name):
+                    continue
+                if exclude and _is_excluded(member.name, exclude):
+                    continue
+                yield member.name, archive.extractfile(member).read()
+
+
+def _safe_members(members, converted):
+    """Helper generator that skips archive members with unsafe names.
+
+    Parameters
+    ----------
+    members : iterable
+        The (name, jpg_data) tuples of '_archive_jpgs'.
+
+    converted : dict
+        The 'converted' of 'convert_archive'. Skipped members are set to
+        'False'.
+
+    Yields
+    ------
+    name, jpg_data : tuple(str, bytes)
+        The members whose name is relative and has no '..' parts, so that
+        it stays inside the target.
+    """
+    for name, jpg_data in members:
+        member = PurePosixPath(name)
+        if member.is_absolute() or ".." in member.parts:
+            print(f"Member was skipped, it leaves the target: {name}")
+            converted[name] = False
+            continue
+        yield name, jpg_data
+
+
+@contextmanager
+def _archive_writer(target):
+    """Helper context manager that adds png-files to an archive or dir.
+
+    Parameters
+    ----------
+    target : str
+        The 'target' is a new tar or zip archive, chosen by its suffix, or
+        otherwise a directory.
+
+    Yields
+    ------
+    add : callable
+        The 'add' takes a member name and png-data and stores it.
+
+    Raises
+    ------
+    ValueError
+        If a member name would be written outside a target directory.
+    """
+    lower = str(target).lower()
+    if lower.endswith(".zip"):
+        # Png-data is already deflated, storing it again saves the cpu.
+        with ZipFile(target, "w", ZIP_STORED) as archive:
+            yield archive.writestr
+    elif _is_archive(target):
+        compression = next((mode for suffix, mode in TAR_MODES.items()
+                            if lower.endswith(suffix)), "")
+        with tarfile.open(target, f"w|{compression}") as archive:
+            def add(name, png_data):
+                info = tarfile.TarInfo(name)
+                info.size = len(png_data)
+                info.mtime = int(time())
+                archive.addfile(info, BytesIO(png_data))
+            yield add
+    else:
+        new_dir = make_dir(target)
+
+        def add(name, png_data):
+            png_path = (new_dir / name).resolve()
+            if new_dir.resolve() not in png_path.parents:
+                raise ValueError(f"Member is outside target: {name}")
+            png_path.parent.mkdir(parents=True, exist_ok=True)
+            _write_png(png_path, png_data)
+        yield add
+
+
+def convert_archive(source_archive, target, workers=None, exclude=None,
+                    window=None, profile="balanced", max_size=None,
+                    scale=None):
+    """
+    The function converts the jpg members of a tar or zip archive.
+
+    Members are read, converted and written as a stream, so no
+    intermediate files or scratch space are needed.
+
+    Parameters
+    ----------
+    source_archive : str
+        The 'source_archive' is a .zip, .tar, .tar.gz, .tar.bz2 or .tar.xz
+        archive with jpg-files.
+
+    target : str
+        The 'target' is a new archive with the png-files. Its type is chosen
+        by its suffix. If it has no archive suffix the png-files are written
+        to a directory instead.
+
+    workers, window : int(optional)
+        The process pool settings, see 'convert_many'.
+
+    exclude : list(optional)
+        The 'exclude' is a list of glob patterns of members to skip.
+
+    profile, max_size, scale : optional
+        The encoder settings, see 'jpg2png'.
+
+    Returns
+    -------
+    converted : dict
+        The 'converted' maps each member name to 'True' if it was converted
+        to png, otherwise 'False'. Members with absolute names or '..'
+        parts are skipped. If two members give the same png name, e.g.
+        'a.jpg' and 'a.jpeg', the second keeps its suffix: 'a.jpeg.png'.
+
+    Raises
+    ------
+    tarfile.TarError, zipfile.BadZipFile
+        If 'source_archive' is not a valid archive. Return value is set to
+        False.
+    """
+    converted = {}
+    members = _safe_members(_archive_jpgs(source_archive, exclude), converted)
+    names, jpgs = tee(members, 2)
+    png_names = set()
+    try:
+        with _archive_writer(target) as add:
+            png_pics = convert_many((jpg for _, jpg in jpgs), workers=workers,
+                                    window=window, profile=profile,
+                                    max_size=max_size, scale=scale)
+            for (name, _), png_data in zip(names, png_pics):
+                png_name = str(PurePosixPath(name).with_suffix(".png"))
+                if png_name in png_names:
+                    png_name = name + ".png"
+                if png_data and png_name in png_names:
+                    print(f"Member was skipped, {png_name} exists: {name}")
+                    png_data = None
+                if png_data:
+                    add(png_name, png_data)
+                    png_names.add(png_name)
+                converted[name] = bool(png_data)
+    except (tarfile.TarError, BadZipFile) as error:
+        print(f"Archive was invalid: {error}")
+        return False
+
+    print(f"Archive '{target}': {sum(converted.values())} png-files")
+    return converted
+
+
+def _poll_dir(dir_path, known, dirs, recursive=False, exclude=None,
+              root=""):
+    """Helper function that lists the new entries of one directory.
+
+    Parameters
+    ----------
+    dir_path : str
+        The 'dir_path' is the directory to read.
+
+    known : dict
+        The 'known' maps each directory to the set of names it holds. The
+        set of 'dir_path' is replaced, so a deleted file that comes back
+        under the same name is new again.
+
+    dirs : dict
+        The 'dirs' maps each watched directory to its mtime. New
+        subdirectories are added with mtime 0, so they are read next.
+
+    recursive : bool(optional)
+        If 'recursive' is True new subdirectories are watched as well.
+
+    exclude : list(optional)
+        The 'exclude' glob patterns, see 'scan_jpgs'. Matching files are
+        skipped and matching directories are not watched.
+
+    root : str(optional)
+        The 'root' is the watched directory, 'exclude' is matched against
+        paths relative to it.
+
+    Returns
+    -------
+    new_files : list
+        The 'new_files' are the os.DirEntry items of new jpg-files.
+    """
+    seen = known.get(dir_path, set())
+    names = set()
+    new_files = []
+    with scandir(dir_path) as entries:
+        for entry in entries:
+            names.add(entry.name)
+            if entry.name in seen:
+                continue
+            rel_path = entry.path[len(root):].lstrip("/")
+            if exclude and _is_excluded(rel_path, exclude):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    dirs[entry.path] = 0
+            elif _filter_jpg(entry.name):
+                new_files.append(entry)
+    known[dir_path] = names
+    return new_files
+
+
+def _poll_jpgs(root_dir, recursive=False, exclude=None, interval=0.5):
+    """Helper generator that finds new jpg-files by polling mtimes.
+
+    Only directories whose mtime changed are read again. A new file is
+    yielded once its size is the same on two polls in a row, so files
+    that are still being written are not converted too early.
+
+    Parameters
+    ----------
+    root_dir : pathlib.Path
+        The 'root_dir' is the watched directory.
+
+    recursive, exclude : optional
+        See 'scan_jpgs'.
+
+    interval : float(optional)
+        The 'interval' is the seconds between two polls.
+
+    Yields
+    ------
+    batch : list
+        The 'batch' is a list of pathlib.Path items of new jpg-files.
+    """
+    exclude = exclude or []
+    root = str(root_dir)
+    dirs = {root: 0}
+    known = {}
+    pending = {}
+
+    # The first poll only records what is already there.
+    while any(mtime == 0 for mtime in dirs.values()):
+        for dir_path in [d for d, mtime in dirs.items() if mtime == 0]:
+            dirs[dir_path] = stat(dir_path).st_mtime_ns
+            _poll_dir(dir_path, known, dirs, recursive, exclude, root)
+
+    # Watching has started, see 'watch_jpgs'.
+    yield []
+
+    while True:
+        sleep(interval)
+        for dir_path, mtime in list(dirs.items()):
+            try:
+                new_mtime = stat(dir_path).st_mtime_ns
+            except OSError:
+                del dirs[dir_path]
+                known.pop(dir_path, None)
+                continue
+            if new_mtime == mtime:
+                continue
+            dirs[dir_path] = new_mtime
+            for entry in _poll_dir(dir_path, known, dirs, recursive, exclude,
+                                   root):
+                pending[entry.path] = -1
+
+        batch = []
+        for jpg_path, size in list(pending.items()):
+            try:
+                new_size = stat(jpg_path).st_size
+            except OSError:
+                del pending[jpg_path]
+                continue
+            if new_size == size and new_size > 0:
+                del pending[jpg_path]
+                batch.append(Path(jpg_path))
+            else:
+                pending[jpg_path] = new_size
+        if batch:
+            yield batch
+
+
+def _inotify_jpgs(root_dir, recursive=False, exclude=None, interval=0.5):
+    """Helper generator that finds new jpg-files with inotify.
+
+    A jpg-file is yielded when it is closed after writing or moved into a
+    watched directory.
+
+    Parameters
+    ----------
+    root_dir : pathlib.Path
+        The 'root_dir' is the watched directory.
+
+    recursive, exclude : optional
+        See 'scan_jpgs'.
+
+    interval : float(optional)
+        The 'interval' is the seconds to wait for events before a batch is
+        yielded.
+
+    Yields
+    ------
+    batch : list
+        The 'batch' is a list of pathlib.Path items of new jpg-files.
+
+    See Also
+    --------
+    inotify_simple.INotify : For more information about inotify.
+    """
+    exclude = exclude or []
+    root = str(root_dir)
+    file_flags = flags.CLOSE_WRITE | flags.MOVED_TO
+    dir_flags = flags.CREATE | flags.MOVED_TO
+
+    with INotify() as inotify:
+        watches = {}
+
+        def add_watch(dir_path):
+            watches[inotify.add_watch(dir_path, file_flags | dir_flags)] = \
+                dir_path
+
+        add_watch(root)
+        if recursive:
+            for dir_path, dir_names, _ in walk(root):
+                rel_dir = dir_path[len(root):].lstrip("/")
+                # Excluded directories are neither watched nor entered.
+                dir_names[:] = [
+                    name for name in dir_names
+                    if not (exclude and _is_excluded(
+                        f"{rel_dir}/{name}".lstrip("/"), exclude))]
+                if dir_path != root:
+                    add_watch(dir_path)
+
+        # Watching has started, see 'watch_jpgs'.
+        yield []
+
+        while True:
+            batch = []
+            for event in inotify.read(timeout=int(interval * 1000)):
+                dir_path = watches.get(event.wd)
+                if dir_path is None or not event.name:
+                    continue
+                path = join(dir_path, event.name)
+                rel_path = path[len(root):].lstrip("/")
+                if exclude and _is_excluded(rel_path, exclude):
+                    continue
+                if event.mask & flags.ISDIR:
+                    if recursive:
+                        add_watch(path)
+                        # Files may land before the watch is in place.
+                        batch.extend(scan_jpgs(Path(path), recursive=True,
+                                               exclude=exclude))
+                elif event.mask & file_flags and _filter_jpg(event.name):
+                    batch.append(Path(path))
+            if batch:
+                yield list(dict.fromkeys(batch))
+
+
+def watch_jpgs(root_dir, recursive=False, exclude=None, interval=0.5):
+    """
+    The generator waits for new jpg-files in a directory.
+
+    The directory is watched with inotify if the optional 'inotify_simple'
+    package is installed, otherwise it is polled.
+
+    Parameters
+    ----------
+    root_dir : pathlib.Path
+        The 'root_dir' is the watched directory.
+
+    recursive : bool(optional)
+        If 'recursive' is True subdirectories are watched as well.
+
+    exclude : list(optional)
+        The 'exclude' is a list of glob patterns of files and directories
+        to skip.
+
+    interval : float(optional)
+        The 'interval' is the seconds between two polls, or to gather
+        inotify events into a batch.
+
+    Yields
+    ------
+    batch : list
+        The 'batch' is a list of pathlib.Path items of new jpg-files. Files
+        that existed before watching started are not yielded.
+
+    Notes
+    -----
+    Watching starts when the function is called, not on the first batch,
+    so files that land while existing files are converted are found.
+    """
+    if INotify is not None:
+        batches = _inotify_jpgs(root_dir, recursive, exclude, interval)
+    else:
+        batches = _poll_jpgs(root_dir, recursive, exclude, interval)
+    next(batches)  # Runs the setup up to the first, empty, batch.
+    return batches
+
+
+def watch(root_dir, new_dir, workers=None, recursive=False, exclude=None,
+          interval=0.5, **options):
+    """
+    The function converts jpg-files as they land in a directory.
+
+    All jpg-files that already exist are converted first. Afterwards only
+    new jpg-files are converted, by a process pool that is kept running,
+    until the process is interrupted.
+
+    Parameters
+    ----------
+    root_dir : str
+        The 'root_dir' relative or absolute from cwd to the watched
+        directory.
+
+    new_dir : str
+        The 'new_dir' the location from cwd to the target directory.
+
+    workers, recursive, exclude : optional
+        See 'main'.
+
+    interval : float(optional)
+        The 'interval' is the seconds between two checks for new files.
+
+    **options : optional
+        Other keyword arguments of 'jpg2png', e.g. 'profile' or 'dedup'.
+
+    Returns
+    -------
+    bool
+        The value is set to 'False' if 'root_dir' is invalid. Otherwise
+        the function only returns when interrupted, with 'True'.
+
+    See Also
+    --------
+    watch_jpgs : For more information about how new files are found.
+    """
+    source_root = is_dir(root_dir)
+    if not source_root:
+        print("Path of directory was invalid")
+        return False
+
+    if workers and workers > 1:
+        pool_context = ProcessPoolExecutor(max_workers=workers)
+    else:
+        pool_context = nullcontext()
+
+    with pool_context as pool:
+        convert = partial(jpg2png, new_location=new_dir, workers=workers,
+                          source_root=source_root, pool=pool, **options)
+        batches = watch_jpgs(source_root, recursive, exclude, interval)
+        all_jpgs = is_file_jpg(root_dir, recursive=recursive, exclude=exclude)
+        if all_jpgs:
+            convert(all_jpgs)
+
+        print(f"Watching {source_root} for new jpg-files")
+        try:
+            for batch in batches:
+                # A failed batch is logged, the watcher keeps running.
+                try:
+                    convert(batch)
+                except Exception as error:
+                    print(f"Batch was not converted: {error}")
+        except KeyboardInterrupt:
+            print("Stopped watching")
+    return True
+
+
+def main(root_dir, new_dir, workers=None, recursive=False, exclude=None,
+         incremental=False, use_hash=False, prune=False, profile="balanced",
+         max_size=None, scale=None, pipeline=False, readers=2, writers=2,
+         stage_depth=8, dedup=False, watch_dir=False, interval=0.5,
+         report_file=None, progress=False, schedule=False,
+         memory_budget=None):
+    """
+    The recipe function  for conversion of jpgs to pngs.
+
+    Parameters
+    ----------
+    root_dir : str
+        The 'root_dir' relative or absolute from cwd to source directory with
+        jpgs files. If 'root_dir' is a tar or zip archive, its members are
+        converted, see 'convert_archive'.
+
+    new_dir: str
+        The 'new_dir' the location from cwd to new directory, or to a new
+        archive if 'root_dir' is an archive.
+
+    workers: int(optional)
+        The 'workers' is the number of processes used for the conversion.
+
+    recursive: bool(optional)
+        If 'recursive' is True subdirectories of 'root_dir' are converted
+        too, and mirrored inside 'new_dir'.
+
+    exclude: list(optional)
+        The 'exclude' is a list of glob patterns of files and directories
+        to skip.
+
+    incremental: bool(optional)
+        If 'incremental' is True only new or changed jpg-files are converted.
+
+    use_hash: bool(optional)
+        If 'use_hash' is True changes are confirmed with a content hash.
+
+    prune: bool(optional)
+        If 'prune' is True png-files of deleted jpg-files are removed.
+
+    profile: str(optional)
+        The 'profile' is the png encoder setting, see 'PNG_PROFILES'.
+
+    max_size: tuple(int, int)(optional)
+        The 'max_size' is the bounding box of the pngs.
+
+    scale: float(optional)
+        The 'scale' is the size factor of the pngs.
+
+    pipeline, readers, writers, stage_depth: optional
+        The settings of the staged pipeline, see 'jpg2png'.
+
+    dedup: bool(optional)
+        If 'dedup' is True identical jpg-files are only converted once.
+
+    watch_dir: bool(optional)
+        If 'watch_dir' is True the function keeps running and converts new
+        jpg-files as they land in 'root_dir', see 'watch'.
+
+    interval: float(optional)
+        The 'interval' is the seconds between two checks for new files.
+
+    report_file: str(optional)
+        The 'report_file' is a path for a json report of the run.
+
+    progress: bool(optional)
+        If 'progress' is True a live progress line is printed to stderr.
+
+    schedule, memory_budget: optional
+        The largest-first scheduling of the process pool, see 'jpg2png'.
+
+    Returns
+    -------
+    dict
+        The per-file conversion results returned by 'jpg2png'.
+
+    See Also
+    --------
+    jpg2png : For more information of expected outcomes.
+
+    """
+    if _is_archive(root_dir) and Path(root_dir).is_file():
+        return convert_archive(root_dir, new_dir, workers=workers,
+                               exclude=exclude, profile=profile,
+                               max_size=max_size, scale=scale)
+
+    if watch_dir:
+        return watch(root_dir, new_dir, workers=workers, recursive=recursive,
+                     exclude=exclude, interval=interval,
+                     incremental=incremental, use_hash=use_hash, prune=prune,
+                     profile=profile, max_size=max_size, scale=scale,
+                     pipeline=pipeline, readers=readers, writers=writers,
+                     stage_depth=stage_depth, dedup=dedup,
+                     progress=progress, schedule=schedule,
+                     memory_budget=memory_budget)
+
+    all_jpgs = is_file_jpg(root_dir, recursive=recursive, exclude=exclude)
+    if all_jpgs:
+        all_png = jpg2png(path_to_jpgs=all_jpgs, new_location=new_dir,
+                          workers=workers, source_root=is_dir(root_dir),
+                          incremental=incremental, use_hash=use_hash,
+                          prune=prune, profile=profile, max_size=max_size,
+                          scale=scale, pipeline=pipeline, readers=readers,
+                          writers=writers, stage_depth=stage_depth,
+                          dedup=dedup, report_file=report_file,
+                          progress=progress, schedule=schedule,
+                          memory_budget=memory_budget)
+        return all_png
+    else:
+        return all_jpgs
+
+
+if __name__ == "__main__":
+    dir_names = ArgumentParser(description="The directory names for jpg2png "
+                                           "conversion")
+    dir_names.add_argument(
+        "source_dir", type=str, nargs="?", default=str(Path.cwd().absolute()),
+        help="The path to the directory, or tar/zip archive, with jpg-files")
+    dir_names.add_argument(
+        "target_dir", type=str, nargs="?", default="./new_pngs",
+        help="The directory path, or tar/zip archive, to store converted "
+             "jpg-files")
+    dir_names.add_argument(
+        "--workers", type=int, default=None,
+        help="The number of processes used for conversion")
+    dir_names.add_argument(
+        "--recursive", action="store_true",
+        help="Convert jpg-files in subdirectories and mirror the tree")
+    dir_names.add_argument(
+        "--exclude", type=str, action="append", default=None,
+        help="Glob pattern of files or directories to skip, repeatable")
+    dir_names.add_argument(
+        "--incremental", action="store_true",
+        help="Only convert jpg-files that are new or changed since last run")
+    dir_names.add_argument(
+        "--hash", action="store_true", dest="use_hash",
+        help="Record content hashes in the manifest of incremental runs")
+    dir_names.add_argument(
+        "--prune", action="store_true",
+        help="Remove png-files whose jpg-file was deleted (incremental)")
+    dir_names.add_argument(
+        "--profile", type=str, choices=list(PNG_PROFILES), default="balanced",
+        help="The png encoder profile, trading speed for file size")
+    dir_names.add_argument(
+        "--max-size", type=_parse_size, default=None,
+        help="Shrink pngs to fit inside WxH, e.g. 640x480")
+    dir_names.add_argument(
+        "--scale", type=float, default=None,
+        help="Shrink pngs by a factor, e.g. 0.5, 0.25 or 0.125")
+    dir_names.add_argument(
+        "--pipeline", action="store_true",
+        help="Overlap reading, encoding and writing in separate stages")
+    dir_names.add_argument(
+        "--readers", type=int, default=2,
+        help="The number of reader threads of the pipeline")
+    dir_names.add_argument(
+        "--writers", type=int, default=2,
+        help="The number of writer threads of the pipeline")
+    dir_names.add_argument(
+        "--stage-depth", type=int, default=8,
+        help="The number of files queued between pipeline stages")
+    dir_names.add_argument(
+        "--dedup", action="store_true",
+        help="Convert identical jpg-files once and link the png-files")
+    dir_names.add_argument(
+        "--watch", action="store_true",
+        help="Keep running and convert new jpg-files as they land")
+    dir_names.add_argument(
+        "--interval", type=float, default=0.5,
+        help="Seconds between two checks for new files in watch mode")
+    dir_names.add_argument(
+        "--report", type=str, default=None, dest="report_file",
+        help="Write a json report with per-stage and per-file timings")
+    dir_names.add_argument(
+        "--progress", action="store_true",
+        help="Print a live progress and throughput line")
+    dir_names.add_argument(
+        "--schedule", action="store_true",
+        help="Convert the largest images first in the process pool")
+    dir_names.add_argument(
+        "--memory-budget", type=float, default=None,
+        help="Megabytes of decoded images held at once with --schedule")
     dir_paths = dir_names.parse_args()
+    if dir_paths.schedule and (dir_paths.pipeline or not (
+            dir_paths.workers and dir_paths.workers > 1)):
+        dir_names.error("--schedule needs --workers > 1 and does not apply "
+                        "to --pipeline")
+    if dir_paths.memory_budget is not None and not dir_paths.schedule:
+        dir_names.error("--memory-budget only applies with --schedule")
 
-    main(root_dir=dir_paths.source_dir, new_dir=dir_paths.target_dir)
+    main(root_dir=dir_paths.source_dir, new_dir=dir_paths.target_dir,
+         workers=dir_paths.workers, recursive=dir_paths.recursive,
+         exclude=dir_paths.exclude, incremental=dir_paths.incremental,
+         use_hash=dir_paths.use_hash, prune=dir_paths.prune,
+         profile=dir_paths.profile, max_size=dir_paths.max_size,
+         scale=dir_paths.scale, pipeline=dir_paths.pipeline,
+         readers=dir_paths.readers, writers=dir_paths.writers,
+         stage_depth=dir_paths.stage_depth, dedup=dir_paths.dedup,
+         watch_dir=dir_paths.watch, interval=dir_paths.interval,
+         report_file=dir_paths.report_file, progress=dir_paths.progress,
+         schedule=dir_paths.schedule, memory_budget=dir_paths.memory_budget)
 
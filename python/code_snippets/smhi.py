@@ -1,19 +1,577 @@
+import json
 import requests
 import pandas as pd
+import matplotlib
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
-from os.path import exists, abspath
+from matplotlib import style
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from os import listdir, makedirs, remove, replace, stat, utime
+from os.path import exists, abspath, join
+from re import sub
+from statistics import median
 from sys import exit
 from geopy import Nominatim
 from geopy.exc import GeopyError
-from bs4 import BeautifulSoup
-from numpy import vstack
+from geopy.location import Location
+from bs4 import BeautifulSoup, SoupStrainer
+from numpy import array, load, repeat, savez, vstack
 from json import JSONDecodeError
+from random import uniform
+from time import monotonic, sleep, time
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from hashlib import sha256
+from argparse import ArgumentParser
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from tempfile import mkstemp
+from threading import Lock
 
 # Global variables
 url_api = "https://opendata-download-metfcst.smhi.se"
 url_doc = "https://opendata.smhi.se/apidocs/metfcst/parameters.html"
 
+# HTTP settings shared by all requests, see configure_session.
+http_timeout = (3.05, 10.0)  # (connect, read) seconds
+http_retries = 3
+http_backoff = 0.5  # seconds, doubled for each retry
+http_retry_status = (429, 500, 502, 503, 504)
+http_session = None
+http_pool_size = 10
+
+# Token buckets limiting requests per second, see configure_rate_limit.
+smhi_bucket = None  # no limit by default
+geocode_bucket = {"rate": 1.0, "burst": 1, "tokens": 1.0, "stamp": 0.0,
+                  "lock": Lock()}  # Nominatim allows one request per second
+
+# On-disk response cache, see configure_cache.
+cache_enabled = True
+cache_dir = ".smhi_cache"
+cache_ttl = 1800.0  # seconds a response is served without asking smhi
+cache_max_bytes = 50 * 2 ** 20
+cache_lock = Lock()  # serializes writers of the batch thread pools
+
+# Persistent geocode cache, see configure_geocode_cache.
+geocode_file = ".smhi_geocode.json"
+geocode_size = 1024  # addresses kept, least recently used are dropped
+geocode_ttl = None  # seconds an address is kept, None keeps it forever
+geocode_entries = None
+geocoder = None
+geocode_lock = Lock()
+
+# Parsed parameter table, keyed by a hash of the 'url_doc' page.
+parameter_file = ".smhi_parameters.json"
+
+# Format of the data files, see configure_output.
+OUTPUT_SUFFIXES = (".csv", ".parquet", ".feather", ".npz")
+output_suffix = ".csv"
+prompt_files = True  # False overwrites existing files, e.g. in run_jobs
+
+# Figure reused by render_chart, one per process.
+chart_figure = None
+
+
+# Shared HTTP session
+def configure_session(pool_size=10, retries=3, backoff=0.5,
+                      connect_timeout=3.05, read_timeout=10.0):
+    """The function (re)creates the HTTP session used for all requests.
+
+    Parameters
+    ----------
+    pool_size : int(optional)
+        The 'pool_size' is the number of kept-alive connections per host.
+
+    retries : int(optional)
+        The 'retries' is the number of retries after a timeout, a
+        connection error or a status code in 'http_retry_status'.
+
+    backoff : float(optional)
+        The 'backoff' is the seconds to wait before the first retry. The
+        wait is doubled for each retry and jittered by +/- 50 %.
+
+    connect_timeout : float(optional)
+        The 'connect_timeout' is the seconds to wait for a connection.
+
+    read_timeout : float(optional)
+        The 'read_timeout' is the seconds to wait for the server to send
+        data.
+
+    Returns
+    -------
+    session : requests.Session(object)
+        The 'session' pools connections, so many requests to smhi reuse the
+        same TCP and TLS connections.
+
+    See Also
+    --------
+    test_smhi_api_get : For more information about retries.
+    """
+    global http_session, http_timeout, http_retries, http_backoff
+    global http_pool_size
+
+    http_pool_size = pool_size
+    http_timeout = (connect_timeout, read_timeout)
+    http_retries = retries
+    http_backoff = backoff
+
+    if http_session is not None:
+        http_session.close()
+
+    # Retries are done in test_smhi_api_get to add jitter.
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                          max_retries=0)
+    http_session = requests.Session()
+    http_session.mount("https://", adapter)
+    http_session.mount("http://", adapter)
+    http_session.headers.update({"Accept-Encoding": "gzip, deflate",
+                                 "User-Agent": "my_smhi_app"})
+    return http_session
+
+
+def get_session():
+    """The function returns the shared HTTP session.
+
+    Returns
+    -------
+    session : requests.Session(object)
+        The 'session' is created with default settings on first use.
+
+    See Also
+    --------
+    configure_session : For more information about the settings.
+    """
+    if http_session is None:
+        return configure_session()
+    return http_session
+
+
+# Rate limiting
+def configure_rate_limit(rate=None, burst=1):
+    """The function limits the requests per second sent to smhi.
+
+    Parameters
+    ----------
+    rate : float(optional)
+        The 'rate' is the average requests per second. If None requests are
+        not limited.
+
+    burst : int(optional)
+        The 'burst' is the number of requests that may be sent at once
+        after a pause.
+
+    Returns
+    -------
+    None
+
+    See Also
+    --------
+    take_token : For more information about the token bucket.
+    """
+    global smhi_bucket
+
+    if rate is None:
+        smhi_bucket = None
+    else:
+        smhi_bucket = {"rate": rate, "burst": burst, "tokens": float(burst),
+                       "stamp": monotonic(), "lock": Lock()}
+
+
+def take_token(bucket):
+    """The function waits until a token bucket allows one request.
+
+    Parameters
+    ----------
+    bucket : dict
+        The 'bucket' holds 'rate', 'burst', 'tokens', 'stamp' and 'lock',
+        e.g. 'smhi_bucket'. If None the function returns at once.
+
+    Returns
+    -------
+    None
+        The token is reserved under the lock and the wait is done outside
+        it, so many threads share one limit without serializing.
+    """
+    if bucket is None:
+        return
+    with bucket["lock"]:
+        now = monotonic()
+        tokens = min(bucket["burst"], bucket["tokens"]
+                     + (now - bucket["stamp"]) * bucket["rate"])
+        bucket["tokens"] = tokens - 1
+        bucket["stamp"] = now
+    if tokens < 1:
+        sleep((1 - tokens) / bucket["rate"])
+
+
+# On-disk response cache
+def configure_cache(enabled=True, directory=".smhi_cache", ttl=1800.0,
+                    max_bytes=50 * 2 ** 20):
+    """The function sets up the on-disk cache of smhi responses.
+
+    Parameters
+    ----------
+    enabled : bool(optional)
+        If 'enabled' is False every request goes to smhi, e.g. --no-cache.
+
+    directory : str(optional)
+        The 'directory' where cached responses are stored.
+
+    ttl : float(optional)
+        The 'ttl' is the seconds a cached response is used without asking
+        smhi. Older responses are revalidated with ETag/Last-Modified.
+
+    max_bytes : int(optional)
+        The 'max_bytes' is the size limit of the cache. The least recently
+        used responses are removed first.
+
+    Returns
+    -------
+    None
+
+    See Also
+    --------
+    smhi_api_get : For more information about how the cache is used.
+    """
+    global cache_enabled, cache_dir, cache_ttl, cache_max_bytes
+
+    cache_enabled = enabled
+    cache_dir = directory
+    cache_ttl = ttl
+    cache_max_bytes = max_bytes
+
+
+def cache_path(url):
+    """The function names the cache files of an url.
+
+    Parameters
+    ----------
+    url : str
+        The 'url' is the full request url, e.g. with lon/lat.
+
+    Returns
+    -------
+    path : str
+        The 'path' without suffix. The metadata is stored in 'path.json'
+        and the response body in 'path.body'.
+    """
+    return join(cache_dir, sha256(url.encode()).hexdigest()[:32])
+
+
+def cache_load(url):
+    """The function loads the cached response of an url.
+
+    Parameters
+    ----------
+    url : str
+        The 'url' is the full request url.
+
+    Returns
+    -------
+    meta, body : tuple(dict, bytes)
+        The 'meta' holds 'url', 'fetched' (epoch seconds), 'etag' and
+        'last_modified'. The 'body' is the response content.
+
+    None : None
+        If the url is not cached or the cache files are broken.
+    """
+    path = cache_path(url)
+    try:
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        with open(path + ".body", "rb") as f:
+            body = f.read()
+        # Marks the entry as recently used for eviction, an entry evicted
+        # meanwhile is a miss.
+        utime(path + ".json")
+    except (OSError, ValueError):
+        return None
+    return meta, body
+
+
+def cache_store(url, response):
+    """The function stores a response in the cache.
+
+    Parameters
+    ----------
+    url : str
+        The 'url' is the full request url.
+
+    response : requests.models.Response(object)
+        The 'response' with status code 200.
+
+    Returns
+    -------
+    None
+        The cache is trimmed to 'cache_max_bytes' afterwards.
+
+    Notes
+    -----
+    Safe to call from several threads, e.g. smhi_batch and run_jobs.
+    """
+    makedirs(cache_dir, exist_ok=True)
+    path = cache_path(url)
+    meta = {
+        "url": url,
+        "fetched": time(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_type": response.headers.get("Content-Type"),
+    }
+    with cache_lock:
+        cache_write(path + ".body", response.content)
+        cache_write(path + ".json", json.dumps(meta).encode())
+        cache_evict()
+
+
+def cache_write(file_name, content):
+    """The function replaces a cache file in one step.
+
+    Parameters
+    ----------
+    file_name : str
+        The 'file_name' of the cache file.
+
+    content : bytes
+        The 'content' is first written to a temporary file of its own, so
+        readers and other processes never see a half written file.
+
+    Returns
+    -------
+    None
+    """
+    fd, tmp_name = mkstemp(dir=cache_dir, suffix=".tmp")
+    try:
+        with open(fd, "wb") as f:
+            f.write(content)
+        replace(tmp_name, file_name)
+    except OSError:
+        try:
+            remove(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def cache_touch(url, meta):
+    """The function writes the metadata of a cached response.
+
+    Parameters
+    ----------
+    url : str
+        The 'url' is the full request url.
+
+    meta : dict
+        The 'meta' as returned by cache_load.
+    """
+    with cache_lock:
+        cache_write(cache_path(url) + ".json", json.dumps(meta).encode())
+
+
+def cache_evict():
+    """The function removes the least recently used responses until the
+    cache is smaller than 'cache_max_bytes'.
+
+    Returns
+    -------
+    removed : int
+        The 'removed' is the number of responses removed.
+    """
+    entries = []
+    total = 0
+    for name in listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        path = join(cache_dir, name[:-len(".json")])
+        try:
+            size = stat(path + ".body").st_size + stat(path + ".json").st_size
+            used = stat(path + ".json").st_mtime
+        except OSError:
+            continue
+        entries.append((used, size, path))
+        total += size
+
+    removed = 0
+    for used, size, path in sorted(entries):
+        if total <= cache_max_bytes:
+            break
+        for suffix in (".json", ".body"):
+            try:
+                remove(path + suffix)
+            except OSError:
+                pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def cached_response(url, meta, body):
+    """The function turns a cached body into a response object.
+
+    Parameters
+    ----------
+    url : str
+        The 'url' is the full request url.
+
+    meta, body : dict, bytes
+        As returned by cache_load.
+
+    Returns
+    -------
+    response : requests.models.Response(object)
+        The 'response' behaves like the original, e.g. .json() and .text.
+    """
+    response = requests.models.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = body
+    response.encoding = "utf-8"
+    response.headers = CaseInsensitiveDict(
+        {"Content-Type": meta.get("content_type") or ""})
+    return response
+
+
+# Persistent geocode cache
+def configure_geocode_cache(file_name=".smhi_geocode.json", size=1024,
+                            ttl=None):
+    """The function sets up the persistent cache of geocoded addresses.
+
+    Parameters
+    ----------
+    file_name : str(optional)
+        The 'file_name' of the json-file where addresses are stored. If
+        None the cache is only kept in memory.
+
+    size : int(optional)
+        The 'size' is the number of addresses kept. The least recently used
+        are dropped first. A 'size' of 0 turns the cache off.
+
+    ttl : float(optional)
+        The 'ttl' is the seconds an address is kept. If None addresses
+        never expire.
+
+    Returns
+    -------
+    None
+
+    See Also
+    --------
+    test_address : For more information about how the cache is used.
+    """
+    global geocode_file, geocode_size, geocode_ttl, geocode_entries
+
+    geocode_file = file_name
+    geocode_size = size
+    geocode_ttl = ttl
+    geocode_entries = None
+
+
+def normalize_address(address):
+    """The function normalizes an address used as geocode cache key.
+
+    Parameters
+    ----------
+    address : str
+        The 'address' as entered by the user.
+
+    Returns
+    -------
+    key : str
+        The 'key' is case folded without extra whitespace or commas, e.g.
+        ' Lund,  Sweden ' and 'lund, sweden' give the same key.
+    """
+    words = address.replace(",", " , ").casefold().split()
+    return " ".join(words).replace(" ,", ",").strip(", ")
+
+
+def geocode_load():
+    """The function returns the geocode cache, loading it on first use.
+
+    Returns
+    -------
+    entries : OrderedDict
+        The 'entries' maps normalized addresses to dict objects with
+        'address', 'latitude', 'longitude' and 'stored'. Least recently
+        used addresses come first.
+    """
+    global geocode_entries
+
+    if geocode_entries is None:
+        geocode_entries = OrderedDict()
+        if geocode_file and exists(geocode_file):
+            try:
+                with open(geocode_file) as f:
+                    geocode_entries.update(json.load(f))
+            except (OSError, ValueError) as error:
+                print(f">>> Geocode cache was not read: {error}")
+    return geocode_entries
+
+
+def geocode_lookup(address):
+    """The function looks up an address in the geocode cache.
+
+    Parameters
+    ----------
+    address : str
+        The 'address' as entered by the user.
+
+    Returns
+    -------
+    location : geopy.location.Location(object)
+        The cached 'location', without any network call.
+
+    None : None
+        If the address is not cached or has expired.
+    """
+    entries = geocode_load()
+    key = normalize_address(address)
+    entry = entries.get(key)
+    if entry is None:
+        return None
+    if geocode_ttl is not None and time() - entry["stored"] > geocode_ttl:
+        del entries[key]
+        return None
+
+    entries.move_to_end(key)
+    return Location(entry["address"],
+                    (entry["latitude"], entry["longitude"]), entry)
+
+
+def geocode_store(address, location):
+    """The function stores a geocoded address and saves the cache.
+
+    Parameters
+    ----------
+    address : str
+        The 'address' as entered by the user.
+
+    location : geopy.location.Location(object)
+        The 'location' found by Nominatim.
+
+    Returns
+    -------
+    None
+    """
+    entries = geocode_load()
+    key = normalize_address(address)
+    entries[key] = {"address": location.address,
+                    "latitude": location.latitude,
+                    "longitude": location.longitude,
+                    "stored": time()}
+    entries.move_to_end(key)
+    while len(entries) > geocode_size:
+        entries.popitem(last=False)
+
+    if geocode_file:
+        try:
+            with open(geocode_file + ".tmp", "w") as f:
+                json.dump(entries, f, indent=1)
+            replace(geocode_file + ".tmp", geocode_file)
+        except OSError as error:
+            print(f">>> Geocode cache was not saved: {error}")
+
+
 # input and checks for input failure address
 def address_input(address=None):
     """The function prompts user to enter a Swedish address.
@@ -69,6 +627,16 @@ def test_address(address_check=None):
     Exception
         If unexpeceted bug/error is encountered.
 
+    Notes
+    -----
+    Found addresses are kept in a persistent cache, so a repeated address
+    resolves without a network call or counting against Nominatim's rate
+    limit.
+
+    See Also
+    --------
+    configure_geocode_cache : For more information about the cache.
+
     """
     # Logic for input
     if address_check == None:
@@ -76,12 +644,23 @@ def test_address(address_check=None):
     else:
         user_input = address_check
 
-    # using geopy module to create locator object.
-    geo_loc = Nominatim(user_agent="my_smhi_app")
+    # Known addresses are resolved without asking Nominatim.
+    if geocode_size:
+        with geocode_lock:
+            location = geocode_lookup(user_input)
+        if location:
+            return location
+
+    # using geopy module to create locator object, once.
+    global geocoder
+    if geocoder is None:
+        geocoder = Nominatim(user_agent="my_smhi_app")
 
     # Make sure location exists.
+    location = None
     try:
-        location = geo_loc.geocode(user_input)
+        take_token(geocode_bucket)
+        location = geocoder.geocode(user_input)
 
     except AttributeError as error:
         message = (
@@ -98,6 +677,9 @@ def test_address(address_check=None):
         print("Something happenden: {}".format(errors))
 
     else:
+        if location and geocode_size:
+            with geocode_lock:
+                geocode_store(user_input, location)
         return location
 
 
@@ -134,8 +716,10 @@ def get_smhi_parameters(response):
     data = []
     id_name = "pmp3g-parameters"
 
-    # Gets html from smhi doc page
-    smhi_soup = BeautifulSoup(response.text, "html.parser")
+    # Gets html from smhi doc page, only the div with the table is parsed.
+    strainer = SoupStrainer("div", attrs={"id": id_name})
+    smhi_soup = BeautifulSoup(response.text, "html.parser",
+                              parse_only=strainer)
 
     # Gets the table with parameter descritions.
     p_table = smhi_soup.find("div", attrs={"id":id_name})
@@ -181,7 +765,62 @@ def get_smhi_parameters(response):
     return (column_headers, data)
 
 
-def get_parameter_table(column_headers, data):
+def load_parameters(page_hash):
+    """The function loads the parsed parameter table from disk.
+
+    Parameters
+    ----------
+    page_hash : str
+        The 'page_hash' is the sha256 hex digest of the 'url_doc' page.
+
+    Returns
+    -------
+    column_headers, data : tuple(object)
+        As returned by get_smhi_parameters.
+
+    None : None
+        If nothing is stored or the page has changed since.
+    """
+    if not parameter_file or not exists(parameter_file):
+        return None
+    try:
+        with open(parameter_file) as f:
+            stored = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if stored.get("hash") != page_hash:
+        return None
+    return (stored["column_headers"], stored["data"])
+
+
+def save_parameters(page_hash, column_headers, data):
+    """The function saves the parsed parameter table to disk.
+
+    Parameters
+    ----------
+    page_hash : str
+        The 'page_hash' is the sha256 hex digest of the 'url_doc' page.
+
+    column_headers, data : list(object)
+        As returned by get_smhi_parameters.
+
+    Returns
+    -------
+    None
+    """
+    if not parameter_file:
+        return
+    stored = {"hash": page_hash, "column_headers": column_headers,
+              "data": data}
+    try:
+        with open(parameter_file + ".tmp", "w") as f:
+            json.dump(stored, f)
+        replace(parameter_file + ".tmp", parameter_file)
+    except OSError as error:
+        print(f">>> Parameter table was not saved: {error}")
+
+
+def get_parameter_table(column_headers, data, write=True):
     """The function creates a csv file and pandas.DataFrame(object)
     from the return values given by get_smhi_parameters function.
 
@@ -196,6 +835,9 @@ def get_parameter_table(column_headers, data):
         The 'data' parameter is a nested list object. For more information
         about structure see 'Examples' in get_smhi_parameters function.
 
+    write : bool(optional)
+        If 'write' is False no file is created.
+
     Returns
     -------
     df : pandas.core.frame.DataFrame(object)
@@ -207,24 +849,26 @@ def get_parameter_table(column_headers, data):
     file_name : csv-file
         The 'file_name' is not return value. The 'file_name' is a csv-file,
         which contains the values in 'df' returna as a csv-file.
-        The 'file_name' is set to 'parameters_smhi' as default.
+        The 'file_name' is set to 'parameters_smhi' as default. The file
+        type follows 'output_suffix'.
 
     See Also
     --------
     test_file_parser : For more information about overwrtining conflict.
+    write_frame : For more information about file types.
 
 
     """
     df = pd.DataFrame(vstack(data), columns=column_headers)
-    file_name = "parameters_smhi"
-    file_name = test_file_parser(file_name)
-    df.to_csv(f"./{file_name}.csv", sep=",", index=False)
-    print("File was created :{}".format(abspath("./"+file_name+".csv")))
+    if not write:
+        return df
+    file_name = write_frame(df, "parameters_smhi")
+    print("File was created :{}".format(abspath(file_name + output_suffix)))
     return df
 
 
 # Connecting to smhi api.
-def smhi_api_get(url, location=None):
+def smhi_api_get(url, location=None, interactive=True):
     """The function tries connect to either to smhi api (see variable called
     'url_api') or the web doc page (see variable called 'url_doc').
 
@@ -238,6 +882,10 @@ def smhi_api_get(url, location=None):
         The 'location' is an optional argument that is passed to retrieved a 10
         day forecast from the smhi-api.
 
+    interactive : bool(optional)
+        If 'interactive' is False errors are raised instead of prompting
+        the user or exiting, see test_smhi_api_get.
+
     Returns
     -------
     response : requests.models.Response(object)
@@ -255,10 +903,17 @@ def smhi_api_get(url, location=None):
         If other status code is obtain than 400 e.g. TimedOutError, Connection
         etc.
 
+    Notes
+    -----
+    Responses are cached on disk by url. A response younger than
+    'cache_ttl' is served from disk. An older one is revalidated with
+    ETag/Last-Modified, so an unchanged forecast only costs a 304.
+
     See Also
     --------
     test_smhi_api_get : For more information about exception handling.
     address_input : For more information about 'location'.
+    configure_cache : For more information about the cache.
 
     """
 
@@ -270,12 +925,36 @@ def smhi_api_get(url, location=None):
     else:
         url_get = url
 
-    response = test_smhi_api_get(url_get)
+    if not cache_enabled:
+        return test_smhi_api_get(url_get, interactive=interactive)
+
+    # Serves fresh responses from disk, revalidates stale ones.
+    cached = cache_load(url_get)
+    headers = {}
+    if cached:
+        meta, body = cached
+        if time() - meta["fetched"] < cache_ttl:
+            return cached_response(url_get, meta, body)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = test_smhi_api_get(url_get, headers=headers,
+                                 interactive=interactive)
+
+    if response is not None and response.status_code == 304 and cached:
+        response.close()
+        meta["fetched"] = time()
+        cache_touch(url_get, meta)
+        return cached_response(url_get, meta, body)
+    if response is not None and response.status_code == 200:
+        cache_store(url_get, response)
 
     return response
 
 
-def test_smhi_api_get(url):
+def test_smhi_api_get(url, headers=None, interactive=True):
     """The function tests connection agains web page and smhi api.
 
     Parameters
@@ -284,6 +963,14 @@ def test_smhi_api_get(url):
         The 'url' is a string object that points to a webpage or api.
         Two valid values to pass as 'url' are 'url_doc' and 'url_api'.
 
+    headers : dict(optional)
+        The 'headers' are extra request headers, e.g. 'If-None-Match'.
+
+    interactive : bool(optional)
+        If 'interactive' is False the errors below are raised to the caller
+        instead of asking for a new address or exiting, so that one failing
+        location does not stop a batch.
+
     Returns
     -------
     response : requests.models.Response(object)
@@ -296,30 +983,77 @@ def test_smhi_api_get(url):
     HTTPError
         If 'location' is not found in smhi api or response is 400.
 
+    ConnectionError, Timeout
+        If the smhi api does not answer. The request is retried up to
+        'http_retries' times with jittered backoff before giving up.
+
     RequestException
         If other status codes are raised by the raise_for_status() function.
 
     See Also
     --------
-    test_smhi_api_get : For more information about exception handling.
+    get_session : For more information about the shared session.
+    take_token : For more information about rate limiting.
     address_input : For more information about 'location'.
 
     """
-    response = requests.get(url, timeout=3.0)
-    try:
-        response.raise_for_status()
-    except requests.exceptions.HTTPError as error:
-        print(">>> Location not found, please enter a swedish city:\n {}".format(error))
-        address_input()
-    except requests.exceptions.RequestException as errors:
-        print(">>> The smhi api encounterd a problem:\n{}".format(errors))
-        exit(1)
-    else:
-        return response
+    session = get_session()
+
+    for attempt in range(http_retries + 1):
+        retry = attempt < http_retries
+        try:
+            take_token(smhi_bucket)
+            response = session.get(url, headers=headers,
+                                   timeout=http_timeout)
+            if retry and response.status_code in http_retry_status:
+                response.close()
+                wait_backoff(attempt)
+                continue
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as error:
+            if not interactive:
+                raise
+            print(">>> Location not found, please enter a swedish city:\n {}".format(error))
+            address_input()
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as errors:
+            if retry:
+                print(">>> The smhi api did not answer, retrying:\n{}".format(errors))
+                wait_backoff(attempt)
+                continue
+            if not interactive:
+                raise
+            print(">>> The smhi api encounterd a problem:\n{}".format(errors))
+            exit(1)
+        except requests.exceptions.RequestException as errors:
+            if not interactive:
+                raise
+            print(">>> The smhi api encounterd a problem:\n{}".format(errors))
+            exit(1)
+        else:
+            return response
+        return
+
+
+def wait_backoff(attempt):
+    """The function sleeps before a retry.
+
+    Parameters
+    ----------
+    attempt : int
+        The 'attempt' is the number of the failed try, starting at 0.
+
+    Returns
+    -------
+    None
+        Sleeps 'http_backoff' * 2 ** 'attempt' seconds, jittered by +/- 50 %
+        so that many clients do not retry at the same moment.
+    """
+    sleep(http_backoff * 2 ** attempt * uniform(0.5, 1.5))
 
 
 # Creation of local files
-def file_parser_api(response, file_name="smhi"):
+def file_parser_api(response, file_name="smhi", suffix=None):
     """The function only accepts requests.get from 'url_api' variable.
     The function gets a 10 day forecast and stores it as a csv-file.
 
@@ -333,6 +1067,10 @@ def file_parser_api(response, file_name="smhi"):
         The 'file_name' parameter is the name of the csv-file created.
         Default value is set to 'smhi'.
 
+    suffix : str(optional)
+        The 'suffix' is the file type, default is 'output_suffix'. Other
+        types than '.csv' are written with forecast_frame and write_frame.
+
     Returns
     -------
     file_name : str(object)
@@ -349,6 +1087,13 @@ def file_parser_api(response, file_name="smhi"):
 
     """
 
+    suffix = suffix or output_suffix
+    if suffix != ".csv":
+        df = forecast_frame(response)
+        if df is not None:
+            return write_frame(df, file_name, suffix=suffix)
+        return
+
     # Trying to create a json object
     try:
         todo = response.json()
@@ -384,6 +1129,84 @@ def file_parser_api(response, file_name="smhi"):
     return file_name
 
 
+def forecast_frame(response, file_name=None, compact=False):
+    """The function builds the 10 day forecast DataFrame straight from the
+    json of a 'url_api' request, without a csv round trip.
+
+    Parameters
+    ----------
+    response : requests.models.Response(object)
+        The 'response' parameter is tied to the request made to smhi api.
+
+    file_name : str(optional)
+        If a 'file_name' is given the forecast is also stored, see
+        write_frame. Default is not to write any file.
+
+    compact : bool(optional)
+        If 'compact' is True the frame is made smaller with compact_frame.
+
+    Returns
+    -------
+    df : pandas.core.frame.DataFrame(object)
+        The 'df' has one row per value with the columns of data_parser_api.
+        'Date_Time' is datetime64 and 'Values' is float. A parameter with
+        several values gets one row per value, numbered by 'Value_Index'.
+
+    None : None
+        If 'response' is not a json object.
+
+    See Also
+    --------
+    file_parser_api : For the csv-file based parsing.
+    data_parser_api : For more information about the columns.
+    """
+    try:
+        todo = response.json()
+    except JSONDecodeError as error:
+        print(f"Get request only valid for json object:\n"
+              f"{response} --> invalid json: {error} ")
+        return
+    finally:
+        response.close()
+
+    # Collects flat columns, time stamps are repeated afterwards.
+    stamps, counts = [], []
+    names, units, values, indices = [], [], [], []
+    for data in todo.get("timeSeries") or []:
+        count = 0
+        for point in data.get("parameters"):
+            point_values = point.get("values") or []
+            names += [point.get("name")] * len(point_values)
+            units += [point.get("unit")] * len(point_values)
+            indices += range(len(point_values))
+            values += point_values
+            count += len(point_values)
+        stamps.append(data.get("validTime").rstrip("Z"))
+        counts.append(count)
+
+    stamps = array(stamps, dtype=str)
+    date_time = repeat(stamps.astype("datetime64[ns]"), counts)
+    df = pd.DataFrame({
+        "Composite_Dates": repeat(stamps, counts),
+        "Name": names,
+        "Unit": units,
+        "Values": array(values, dtype=float),
+        "Value_Index": array(indices, dtype=int),
+        "Dates": repeat(stamps.astype("U10"), counts),
+        "Time": repeat([i[11:] for i in stamps], counts),
+        "Date_Time": date_time,
+    })
+    df["Weekday"] = df.Date_Time.dt.day_name()
+    if compact:
+        df = compact_frame(df)
+
+    if file_name:
+        file_name = write_frame(df, file_name)
+        print(f"{file_name}{output_suffix} was created")
+
+    return df
+
+
 def test_file_parser(file_name, suffix=".csv" ):
     """The function is file name maker test function.
 
@@ -400,9 +1223,14 @@ def test_file_parser(file_name, suffix=".csv" ):
     Returns
     -------
     file_name : str
-        The 'file_name' return is only passed if file name is unique.
+        The 'file_name' return is only passed if file name is unique. If
+        'prompt_files' is False the 'file_name' is returned as is and an
+        existing file is overwritten.
 
     """
+    if not prompt_files:
+        return file_name
+
     # Gets csv files in current working directory
     csv_files_present =  exists(file_name + suffix)
     count = 0
@@ -427,8 +1255,131 @@ def test_file_parser(file_name, suffix=".csv" ):
     return file_name
 
 
+# Output formats
+def configure_output(suffix=".csv"):
+    """The function sets the file type of the data files.
+
+    Parameters
+    ----------
+    suffix : str(optional)
+        The 'suffix' is one of 'OUTPUT_SUFFIXES'. Csv-files are the default,
+        the other types keep column dtypes and can be read column by column.
+
+    Returns
+    -------
+    bool
+        False if the 'suffix' is unknown, otherwise True.
+    """
+    global output_suffix
+
+    if suffix not in OUTPUT_SUFFIXES:
+        print(f">>> Unknown file type: {suffix}, valid: {OUTPUT_SUFFIXES}")
+        return False
+    output_suffix = suffix
+    return True
+
+
+def write_frame(df, file_name, suffix=None):
+    """The function writes a DataFrame in one of 'OUTPUT_SUFFIXES'.
+
+    Parameters
+    ----------
+    df : pandas.core.frame.DataFrame(object)
+        The 'df' to write, the index is not stored.
+
+    file_name : str
+        The 'file_name' without suffix. If the file exists the user is asked
+        for a new name, see test_file_parser.
+
+    suffix : str(optional)
+        The 'suffix' is the file type, default is 'output_suffix'.
+
+    Returns
+    -------
+    file_name : str
+        The 'file_name' the data was written to, without suffix.
+
+    Notes
+    -----
+    A named index, e.g. 'Date_Time' of compact_frame, is written as a
+    column. MultiIndex columns, e.g. of the parameter table, are written
+    as json lists, '["Unit"]', and read back by read_frame. '.parquet' and
+    '.feather' need the pyarrow module. '.npz' stores one numpy array per
+    column, text columns as fixed width unicode.
+    """
+    suffix = suffix or output_suffix
+    file_name = test_file_parser(file_name, suffix=suffix)
+    path = file_name + suffix
+    if any(df.index.names):
+        df = df.reset_index()
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.set_axis([json.dumps(list(column)) for column in df.columns],
+                         axis=1)
+
+    if suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    elif suffix == ".feather":
+        df.reset_index(drop=True).to_feather(path)
+    elif suffix == ".npz":
+        arrays = {}
+        for column in df.columns:
+            values = df[column].to_numpy()
+            if values.dtype == object:
+                values = values.astype(str)
+            arrays[column] = values
+        savez(path, **arrays)
+    else:
+        df.to_csv(path, sep=",", index=False)
+    return file_name
+
+
+def read_frame(file_name, suffix=None, columns=None):
+    """The function reads a DataFrame written by write_frame.
+
+    Parameters
+    ----------
+    file_name : str
+        The 'file_name' without suffix.
+
+    suffix : str(optional)
+        The 'suffix' is the file type, default is 'output_suffix'.
+
+    columns : list(optional)
+        The 'columns' to read. Only these columns are read from disk for
+        '.parquet', '.feather' and '.npz'. Default is all columns.
+
+    Returns
+    -------
+    df : pandas.core.frame.DataFrame(object)
+        The 'df' with the stored dtypes. For csv-files 'Date_Time' is
+        parsed as datetime64. Columns written as json lists are turned
+        back into MultiIndex columns.
+    """
+    suffix = suffix or output_suffix
+    path = abspath(file_name + suffix)
+
+    if suffix == ".parquet":
+        df = pd.read_parquet(path, columns=columns)
+    elif suffix == ".feather":
+        df = pd.read_feather(path, columns=columns)
+    elif suffix == ".npz":
+        with load(path) as npz:
+            df = pd.DataFrame({column: npz[column]
+                               for column in columns or npz.files})
+    else:
+        df = pd.read_csv(path, sep=",", header=0, usecols=columns)
+        if "Date_Time" in df:
+            df["Date_Time"] = pd.to_datetime(df.Date_Time)
+
+    if len(df.columns) and all(str(column).startswith("[")
+                               for column in df.columns):
+        df.columns = pd.MultiIndex.from_tuples(
+            [tuple(json.loads(column)) for column in df.columns])
+    return df
+
+
 # Getting down sampling data.
-def data_parser_api(file_name, suffix=".csv" ):
+def data_parser_api(file_name, suffix=None, compact=False):
     """The function parses api data from 'url_api' and creates three new
     columns.
 
@@ -437,7 +1388,12 @@ def data_parser_api(file_name, suffix=".csv" ):
         function.
 
     suffix : str(optional)
-        The 'suffix' parameter flags for filetyp e.g. '.csv', '.txt' or '.jpg'.
+        The 'suffix' parameter flags for filetyp e.g. '.csv' or '.parquet'.
+        Default is 'output_suffix'. Other types than '.csv' already hold
+        all columns and are only read.
+
+    compact : bool(optional)
+        If 'compact' is True the frame is made smaller with compact_frame.
 
     Returns
     -------
@@ -447,14 +1403,20 @@ def data_parser_api(file_name, suffix=".csv" ):
     See Also
     --------
     file_parser_api : For more information about 'file_name'.
+    compact_frame : For more information about 'compact'.
 
     """
+    suffix = suffix or output_suffix
+    if suffix != ".csv":
+        df = read_frame(file_name, suffix=suffix)
+        return compact_frame(df) if compact else df
+
     # Creates abosolute path for file
     find_path = abspath(file_name + suffix)
     df = pd.read_csv(find_path, sep=",", header=0, usecols=range(4))
 
     # Splits column called "Composite_Dates" into two new columms
-    df["Dates"], df["Time"] = df.Composite_Dates.str.split("T").str
+    df[["Dates", "Time"]] = df.Composite_Dates.str.split("T", expand=True)
 
     # Creates time and data composite
     df["Date_Time"] = df.Dates + " " + df.Time
@@ -462,12 +1424,67 @@ def data_parser_api(file_name, suffix=".csv" ):
     # Creates Series of Dates columns
     s_dates = df.Dates
 
-    df["Weekday"] = pd.to_datetime(s_dates).apply(lambda x: x.day_name())
+    df["Weekday"] = pd.to_datetime(s_dates).dt.day_name()
 
-    return df
+    return compact_frame(df) if compact else df
+
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday",
+            "Saturday", "Sunday")
 
 
-def filter_data(df, file_name="smhi_filter", filter_key="t"):
+def compact_frame(df, report=True):
+    """The function shrinks a long forecast frame in memory.
+
+    Parameters
+    ----------
+    df : pandas.core.frame.DataFrame(object)
+        The 'df' is the long forecast of forecast_frame, data_parser_api or
+        smhi_batch.
+
+    report : bool(optional)
+        If 'report' is True the memory usage before and after is printed.
+
+    Returns
+    -------
+    df : pandas.core.frame.DataFrame(object)
+        The compact 'df' is indexed by datetime64 'Date_Time' without the
+        string columns 'Composite_Dates', 'Dates' and 'Time'. 'Name', 'Unit',
+        'Weekday' and 'Location'/'Address' are categorical, 'Values' and
+        coordinates are float32.
+
+    Notes
+    -----
+    float32 keeps about 7 significant digits, which is more than smhi
+    gives. The weekday is taken from the index, not row by row.
+    """
+    before = df.memory_usage(deep=True).sum()
+
+    date_time = pd.DatetimeIndex(pd.to_datetime(df.Date_Time),
+                                 name="Date_Time")
+    compact = df.drop(columns=["Composite_Dates", "Dates", "Time",
+                               "Date_Time", "Weekday"], errors="ignore")
+    compact.index = date_time
+
+    for column in ("Location", "Address", "Name", "Unit"):
+        if column in compact:
+            compact[column] = compact[column].astype("category")
+    for column in ("Values", "Latitude", "Longitude"):
+        if column in compact:
+            compact[column] = compact[column].astype("float32")
+    if "Value_Index" in compact:
+        compact["Value_Index"] = compact.Value_Index.astype("int8")
+    compact["Weekday"] = pd.Categorical(date_time.day_name(),
+                                        categories=WEEKDAYS)
+
+    if report:
+        after = compact.memory_usage(deep=True).sum()
+        print(f">>> Memory usage: {before / 2 ** 20:.2f} MiB -> "
+              f"{after / 2 ** 20:.2f} MiB ({after / before:.0%})")
+    return compact
+
+
+def filter_data(df, file_name="smhi_filter", filter_key="t", suffix=None):
     """The function reduces the 10 day forecast to a weather trait.
 
     Parameters
@@ -483,6 +1500,9 @@ def filter_data(df, file_name="smhi_filter", filter_key="t"):
         The 'filter_key' parameter is string object that filters
         the data in 'df'. The filter is concern to single weather phenomena.
 
+    suffix : str(optional)
+        The 'suffix' is the file type, default is 'output_suffix'.
+
     Returns
     -------
     df_filter, file_name : tuple(pandas.core.frame.DataFrame(object), str)
@@ -497,10 +1517,10 @@ def filter_data(df, file_name="smhi_filter", filter_key="t"):
 
     """
     df_filter = df[df["Name"]==filter_key]
-    file_name = test_file_parser(file_name, suffix=".csv")
+    suffix = suffix or output_suffix
+    file_name = write_frame(df_filter, file_name, suffix=suffix)
 
     if file_name:
-        df_filter.to_csv(f"./{file_name}.csv", sep=",", index=False)
         return (df_filter, file_name)
     else:
         print(f">>> File was not created: {file_name + suffix}")
@@ -508,9 +1528,88 @@ def filter_data(df, file_name="smhi_filter", filter_key="t"):
     return f"File was created {file_name + suffix}"
 
 
+def wide_frame(df):
+    """The function pivots the long forecast to one column per parameter.
+
+    Parameters
+    ----------
+    df : pandas.core.frame.DataFrame(object)
+        The 'df' is the long forecast of forecast_frame, data_parser_api or
+        smhi_batch.
+
+    Returns
+    -------
+    wide : pandas.core.frame.DataFrame(object)
+        The 'wide' is indexed by 'Date_Time', or by 'Location' and
+        'Date_Time' for a batch, with one float column per parameter, e.g.
+        wide["t"] or wide[["t", "ws", "Wsymb2"]]. Further values of a
+        parameter with several values get the columns 'name_1', 'name_2'
+        etc. The units are kept in wide.attrs["units"].
+
+    Notes
+    -----
+    The pivot is done once, afterwards each parameter is a column lookup
+    instead of a scan of the long frame like filter_data does. Repeated
+    rows of one time and parameter, e.g. a location fetched twice, are
+    kept once.
+
+    See Also
+    --------
+    export_wide : For writing the whole forecast in one file.
+    """
+    if "Date_Time" not in df.columns:
+        df = df.reset_index()
+
+    columns = df.Name.astype(str)
+    if "Value_Index" in df:
+        columns = columns.where(df.Value_Index == 0,
+                                columns + "_" + df.Value_Index.astype(str))
+
+    index = ["Date_Time"]
+    if "Location" in df:
+        index = ["Location", "Date_Time"]
+
+    df = df.assign(Column=columns).drop_duplicates(
+        subset=index + ["Column"], keep="last")
+    wide = df.pivot(index=index, columns="Column", values="Values")
+    wide.columns.name = None
+    wide.attrs["units"] = dict(zip(df.Column, df.Unit))
+    return wide
+
+
+def export_wide(df, file_name="smhi_wide", suffix=None):
+    """The function writes the whole forecast as one wide table.
+
+    Parameters
+    ----------
+    df : pandas.core.frame.DataFrame(object)
+        The 'df' is the long forecast, see wide_frame.
+
+    file_name : str(optional)
+        The 'file_name' without suffix, default is 'smhi_wide'.
+
+    suffix : str(optional)
+        The 'suffix' is the file type, default is 'output_suffix'.
+
+    Returns
+    -------
+    wide, file_name : tuple(pandas.core.frame.DataFrame(object), str)
+        The 'wide' table and the 'file_name' it was written to. The index
+        is written as ordinary columns.
+
+    See Also
+    --------
+    wide_frame : For more information about 'wide'.
+    write_frame : For more information about file types.
+    """
+    wide = wide_frame(df)
+    file_name = write_frame(wide.reset_index(), file_name, suffix=suffix)
+    return (wide, file_name)
+
+
 # Plotting data
 
-def plot_line(file_name, location, parameter, suffix=".csv"):
+def plot_line(file_name, location, parameter, suffix=None):
     """The function creates a line figure. The figure is saved as png and
     has the aspect 16 X 8 inches.
 
@@ -529,22 +1628,22 @@ def plot_line(file_name, location, parameter, suffix=".csv"):
 
 
     suffix : str(optional)
-        The 'suffix' is the filetype flag e.g. .csv, .jpg or png.
+        The 'suffix' is the filetype flag e.g. .csv or .parquet. Default
+        is 'output_suffix'.
 
     Returns
     -------
     png : file(object)
         The 'png' created from the 'file_name' file.
     """
-    # Creates path to file.
-    file_name = file_name.rstrip(".csv")
-    find_path = abspath(file_name+suffix)
+    # Removes the file type from the file name.
+    suffix = suffix or output_suffix
+    if file_name.endswith(suffix):
+        file_name = file_name[:-len(suffix)]
 
-    # Reads down filter data.
-    data = pd.read_csv(
-        find_path, sep =",", header=0, parse_dates=["Date_Time"],
-        usecols=["Date_Time", "Values"]
-    )
+    # Reads down filter data, only the two plotted columns.
+    data = read_frame(file_name, suffix=suffix,
+                      columns=["Date_Time", "Values"])
 
     # Calcultes mean values of weather phenomena.
     data["Mean"] = data.Values.mean()
@@ -587,6 +1686,167 @@ def plot_line(file_name, location, parameter, suffix=".csv"):
     return f"File created {file_name}"
 
 
+def chart_spec(file_name, data, location, parameter):
+    """The function describes one chart for render_charts.
+
+    Parameters
+    ----------
+    file_name : str
+        The 'file_name' of the png without suffix.
+
+    data : pandas.core.frame.DataFrame(object)
+        The 'data' with the columns 'Date_Time' and 'Values', e.g. from
+        filter_data. Nothing is read from disk.
+
+    location, parameter : geopy.location.Location, pandas object
+        As passed to plot_line.
+
+    Returns
+    -------
+    chart : dict
+        The 'chart' with 'file_name', 'dates', 'values', 'title', 'label'
+        and 'ylabel', which can be sent to another process.
+    """
+    if "Date_Time" not in data.columns:
+        data = data.reset_index()
+    return {
+        "file_name": file_name,
+        "dates": pd.to_datetime(data.Date_Time).to_numpy(),
+        "values": data.Values.to_numpy(dtype=float),
+        "title": f"Forecast for the next 10 days in {location.address}",
+        "label": f"{parameter.Unit[0]}",
+        "ylabel": f"{parameter.Description[0]}",
+    }
+
+
+def chart_style():
+    """The function returns the matplotlib style of plot_line.
+
+    Returns
+    -------
+    list
+        ['ggplot'] if the style is available, otherwise an empty list.
+    """
+    return ["ggplot"] if "ggplot" in style.available else []
+
+
+def chart_template():
+    """The function creates the figure that render_chart reuses.
+
+    Returns
+    -------
+    figure : matplotlib.figure.Figure(object)
+        A 16 X 8 inches figure with one axes and its own Agg canvas, so it
+        renders without pyplot or a display.
+    """
+    figure = Figure(figsize=(16, 8))
+    FigureCanvasAgg(figure)
+    figure.add_subplot()
+    return figure
+
+
+def chart_init():
+    """The function prepares a worker process for render_chart.
+
+    Returns
+    -------
+    None
+        The non-interactive Agg backend and the style of plot_line are set
+        for the whole worker process and a figure is created for reuse.
+        Only used as initializer of the process pool of render_charts.
+    """
+    global chart_figure
+
+    matplotlib.use("Agg")
+    style.use(chart_style())
+    chart_figure = chart_template()
+
+
+def render_chart(chart, figure=None):
+    """The function renders one chart like plot_line does.
+
+    Parameters
+    ----------
+    chart : dict
+        The 'chart' as returned by chart_spec.
+
+    figure : matplotlib.figure.Figure(optional)
+        The 'figure' of chart_template to draw on. Default is the figure of
+        chart_init in a worker process.
+
+    Returns
+    -------
+    png : str
+        The file name of the created png.
+
+    Notes
+    -----
+    The figure is cleared and reused instead of creating a new one for
+    every chart. Outside a worker process without a 'figure' the chart is
+    rendered by render_charts with one worker.
+    """
+    figure = figure or chart_figure
+    if figure is None:
+        return render_charts([chart], workers=1)[0]
+    ax = figure.axes[0]
+    ax.clear()
+
+    # Same artists and settings as plot_line.
+    ax.plot(chart["dates"], chart["values"], "g-", label=chart["label"],
+            lw=3.5)
+    ax.plot(chart["dates"], [chart["values"].mean()] * len(chart["values"]),
+            "k--", label="Mean", lw=1.2)
+    ax.set_title(chart["title"])
+    ax.set_xlabel("")
+    ax.set_ylabel(chart["ylabel"])
+    ax.legend(frameon=False)
+    ax.xaxis.set_minor_formatter(mdates.DateFormatter("%H"))
+    ax.minorticks_on()
+    ax.tick_params(axis="x", which="major", pad=10.8, length=20, width=2.1)
+
+    png = chart["file_name"] + ".png"
+    figure.savefig(png)
+    return png
+
+
+def render_charts(charts, workers=None):
+    """The function renders many charts across a process pool.
+
+    Parameters
+    ----------
+    charts : list
+        The 'charts' are dict objects from chart_spec.
+
+    workers : int(optional)
+        The 'workers' is the number of processes, default is the number of
+        cpus. With 1 worker the charts are rendered in this process, inside
+        a style context, so its backend and rcParams are left unchanged.
+
+    Returns
+    -------
+    pngs : list
+        The 'pngs' file names in the order of 'charts'.
+
+    Notes
+    -----
+    The pngs are the same pixels as the ones of plot_line, without any
+    file being read and without a display.
+
+    See Also
+    --------
+    chart_spec : For more information about a chart.
+    render_chart : For more information about the rendering.
+    """
+    if workers == 1:
+        with style.context(chart_style()):
+            figure = chart_template()
+            return [render_chart(chart, figure) for chart in charts]
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=chart_init) as pool:
+        return list(pool.map(render_chart, charts, chunksize=4))
+
+
 # User choices
 
 def user_choice(t_parameters):
@@ -667,7 +1927,7 @@ def test_user_input(t_parameters):
 
 
 # Recipe functions
-def smhi_web_crawler(url_doc):
+def smhi_web_crawler(url_doc, interactive=True, write=True):
     """The function retrieves data from 'url_doc' variable.
 
     Parameters
@@ -676,6 +1936,14 @@ def smhi_web_crawler(url_doc):
         The 'url_doc' is a string object that enables connection to
         smhi documention regarding data structure.
 
+    interactive : bool(optional)
+        If 'interactive' is False request errors are raised, see
+        test_smhi_api_get.
+
+    write : bool(optional)
+        If 'write' is False 'parameters_smhi.csv' is not written, e.g. by
+        run_jobs.
+
     Returns
     -------
     smhi_descript : pandas.core.frame.DataFrame(object)
@@ -687,18 +1955,33 @@ def smhi_web_crawler(url_doc):
     smhi_api_get : For more information regarding 'location' variable.
     get_smhi_parameters : For more information about parsing web data.
     get_parameter_table : For more information about 'smhi_descript'
+    load_parameters : For more information about the stored table.
 
+    Notes
+    -----
+    The parsed table is stored in 'parameter_file' together with a hash of
+    the page. As long as the page is unchanged the table is loaded from
+    disk and 'parameters_smhi.csv' is not written again.
 
     """
 
     # Establish connection to smhi doc_page.
-    smhi_doc_request = smhi_api_get(url_doc, location=None)
-
-    # Parsing data docpage of smhi.
-    columns, data = get_smhi_parameters(smhi_doc_request)
+    smhi_doc_request = smhi_api_get(url_doc, location=None,
+                                    interactive=interactive)
+    page_hash = sha256(smhi_doc_request.content).hexdigest()
+    stored = load_parameters(page_hash)
+
+    if stored:
+        smhi_doc_request.close()
+        columns, data = stored
+        smhi_descript = get_parameter_table(columns, data, write=False)
+    else:
+        # Parsing data docpage of smhi.
+        columns, data = get_smhi_parameters(smhi_doc_request)
+        save_parameters(page_hash, columns, data)
 
-    # Creating file and DataFrame object of web content.
-    smhi_descript = get_parameter_table(columns, data)
+        # Creating file and DataFrame object of web content.
+        smhi_descript = get_parameter_table(columns, data, write=write)
 
     # Fixing minor issue with table
     smhi_descript.iat[18, 0] = "Wsymb2"
@@ -740,8 +2023,7 @@ def smhi_forecast(url_api, choice):
     address_input : For more information about 'location' return.
     smhi_api_get : For more information about 'smhi_api_request' variable and
                    error handling of connection to api.
-    file_parser_api : For more information about 'smhi_forecast_filename'.
-    data_parser_api : For more information about 'smhi_data'.
+    forecast_frame : For more information about 'smhi_data'.
     filter_data : For more information about 'smhi_sample' and
                   'smhi_sample_name' returns.
 
@@ -757,11 +2039,8 @@ def smhi_forecast(url_api, choice):
     # Establish connection to smhi api
     smhi_api_request = smhi_api_get(url_api, location=location)
 
-    # Creating data file from obtained data
-    smhi_forecast_filename = file_parser_api(smhi_api_request)
-
-    # Creating pd.DataFrame object
-    smhi_data = data_parser_api(smhi_forecast_filename)
+    # Creating pd.DataFrame object straight from the json.
+    smhi_data = forecast_frame(smhi_api_request)
 
     # Sampled Data
     smhi_sample, smhi_sample_name = filter_data(
@@ -773,6 +2052,392 @@ def smhi_forecast(url_api, choice):
     return (smhi_sample, smhi_sample_name, location)
 
 
+def fetch_location(address):
+    """The function fetches the forecast of one location for a batch.
+
+    Parameters
+    ----------
+    address : str
+        The 'address' is a Swedish city name, postcode or similar.
+
+    Returns
+    -------
+    df : pandas.core.frame.DataFrame(object)
+        The forecast of forecast_frame, tagged with the columns 'Location'
+        ('address'), 'Address', 'Latitude' and 'Longitude'.
+
+    Raises
+    ------
+    LookupError
+        If the address is not found.
+
+    RequestException
+        If smhi cannot be reached or does not know the location.
+
+    ValueError
+        If smhi does not answer with json.
+    """
+    location = test_address(address)
+    if not location:
+        raise LookupError(f"Location was not found: {address}")
+
+    response = smhi_api_get(url_api, location=location, interactive=False)
+    df = forecast_frame(response)
+    if df is None:
+        raise ValueError(f"No forecast for: {address}")
+
+    df.insert(0, "Location", address)
+    df.insert(1, "Address", location.address)
+    df.insert(2, "Latitude", location.latitude)
+    df.insert(3, "Longitude", location.longitude)
+    return df
+
+
+def batch_resources(workers, rate=None, burst=None):
+    """The function sizes the shared HTTP resources for a worker pool.
+
+    Parameters
+    ----------
+    workers : int
+        The 'workers' that send requests at the same time. The connection
+        pool is grown to at least this size.
+
+    rate, burst : float, int(optional)
+        If 'rate' is not None the requests to smhi are limited, see
+        configure_rate_limit. The 'burst' defaults to 'workers'.
+
+    Returns
+    -------
+    None
+    """
+    if workers > http_pool_size:
+        configure_session(pool_size=workers, retries=http_retries,
+                          backoff=http_backoff,
+                          connect_timeout=http_timeout[0],
+                          read_timeout=http_timeout[1])
+    if rate is not None:
+        configure_rate_limit(rate, burst or workers)
+
+
+def smhi_batch(addresses, workers=8, rate=None, burst=None, compact=False):
+    """The function fetches forecasts for many locations concurrently.
+
+    Parameters
+    ----------
+    addresses : list
+        The 'addresses' are str objects, e.g. Swedish municipalities. An
+        address given more than once is fetched once.
+
+    workers : int(optional)
+        The 'workers' is the number of locations fetched at the same time.
+
+    rate : float(optional)
+        The 'rate' is the maximum requests per second sent to smhi, shared
+        by all workers. If None requests are not limited.
+
+    burst : int(optional)
+        The 'burst' of the rate limit, default is 'workers'.
+
+    compact : bool(optional)
+        If 'compact' is True the combined frame is made smaller with
+        compact_frame.
+
+    Returns
+    -------
+    df, failures : tuple(pandas.core.frame.DataFrame(object), dict)
+        The 'df' is the combined forecast of all found locations in the
+        order of 'addresses', see fetch_location. The 'failures' maps each
+        address that failed to its error message.
+
+    Notes
+    -----
+    Geocoding is limited to one request per second by Nominatim, so new
+    addresses are slow the first time. Found addresses are cached, see
+    configure_geocode_cache.
+
+    See Also
+    --------
+    fetch_location : For more information about a single location.
+    configure_rate_limit : For more information about the rate limit.
+    """
+    batch_resources(workers, rate, burst)
+
+    frames = []
+    failures = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(address, pool.submit(fetch_location, address))
+                   for address in dict.fromkeys(addresses)]
+        for address, future in futures:
+            try:
+                frames.append(future.result())
+            except Exception as error:
+                print(f">>> Forecast failed for {address}: {error}")
+                failures[address] = str(error)
+
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+        if compact:
+            df = compact_frame(df)
+    else:
+        df = pd.DataFrame()
+    return (df, failures)
+
+
+# Headless batch jobs
+def load_job_spec(file_name):
+    """The function reads and checks a job spec for run_jobs.
+
+    Parameters
+    ----------
+    file_name : str
+        The 'file_name' of a json-file, e.g.
+        {"locations": ["Lund", "Kiruna"], "parameters": ["t", "ws"],
+        "output_dir": "forecasts", "formats": ["parquet"], "workers": 8,
+        "rate": 10, "plot": true}. Only 'locations' and 'parameters' are
+        required.
+
+    Returns
+    -------
+    spec : dict
+        The 'spec' with repeated locations removed and defaults filled in:
+        'output_dir' ('forecasts'),
+        'formats' (['csv']), 'workers' (8), 'rate' (None), 'plot' (False)
+        and 'render_workers' (None, the number of cpus).
+
+    None : None
+        If the file cannot be read or the spec is not valid, e.g. when two
+        locations give the same file name, see location_file_name.
+    """
+    try:
+        with open(file_name) as f:
+            spec = json.load(f)
+    except (OSError, ValueError) as error:
+        print(f">>> Job spec was not read: {error}")
+        return
+
+    spec = {"output_dir": "forecasts", "formats": ["csv"], "workers": 8,
+            "rate": None, "plot": False, "render_workers": None, **spec}
+    for key in ("locations", "parameters", "formats"):
+        if not spec.get(key) or isinstance(spec[key], str):
+            print(f">>> Job spec needs a list of '{key}'")
+            return
+    for file_format in spec["formats"]:
+        if "." + file_format.lstrip(".") not in OUTPUT_SUFFIXES:
+            print(f">>> Unknown file type: {file_format}, "
+                  f"valid: {OUTPUT_SUFFIXES}")
+            return
+
+    # Jobs write to files named after their location, these must differ.
+    spec["locations"] = list(dict.fromkeys(spec["locations"]))
+    file_names = {}
+    for location in spec["locations"]:
+        file_names.setdefault(location_file_name(location), []).append(
+            location)
+    clashes = [i for i in file_names.values() if len(i) > 1]
+    if clashes:
+        print(f">>> Locations share a file name, rename them: {clashes}")
+        return
+    return spec
+
+
+def location_file_name(location):
+    """The function turns a location into a file name.
+
+    Parameters
+    ----------
+    location : str
+        The 'location', e.g. 'Malmö, Skåne'.
+
+    Returns
+    -------
+    file_name : str
+        The 'file_name' e.g. 'malmö_skåne'.
+    """
+    return sub(r"[^\w-]+", "_", location.casefold()).strip("_")
+
+
+def run_job(location, parameters, output_dir, suffixes, plot=None):
+    """The function fetches and stores the forecast of one location.
+
+    Parameters
+    ----------
+    location : str
+        The 'location' as given in the job spec.
+
+    parameters : list
+        The 'parameters' to keep, e.g. ['t', 'ws'].
+
+    output_dir : str
+        The 'output_dir' the files are written to.
+
+    suffixes : list
+        The 'suffixes' of the files, see 'OUTPUT_SUFFIXES'. One file per
+        suffix with 'Date_Time' and one column per parameter is written.
+
+    plot : dict(optional)
+        If 'plot' maps parameters to their rows of the parameter table, as
+        user_choice returns them, a chart per parameter is returned for
+        render_charts.
+
+    Returns
+    -------
+    result : dict
+        The 'result' holds 'seconds', 'files', 'charts' and 'missing', the
+        parameters smhi has no values for at this location.
+
+    Raises
+    ------
+    LookupError, RequestException, ValueError
+        See fetch_location.
+    """
+    start = monotonic()
+    forecast = fetch_location(location)
+    wide = wide_frame(forecast.drop(columns=["Location"]))
+    found = [i for i in parameters if i in wide.columns]
+    table = wide[found].reset_index()
+
+    base_name = join(output_dir, location_file_name(location))
+    files = []
+    for suffix in suffixes:
+        files.append(write_frame(table, base_name, suffix=suffix) + suffix)
+
+    charts = []
+    if plot is not None:
+        place = Location(forecast.Address[0], (forecast.Latitude[0],
+                                                forecast.Longitude[0]), {})
+        for parameter in found:
+            data = table[["Date_Time", parameter]].rename(
+                columns={parameter: "Values"})
+            charts.append(chart_spec(f"{base_name}_{parameter}", data, place,
+                                     plot[parameter]))
+
+    return {"seconds": monotonic() - start, "files": files,
+            "charts": charts,
+            "missing": [i for i in parameters if i not in found]}
+
+
+def run_jobs(spec):
+    """The function runs the smhi pipeline unattended for a job spec.
+
+    Parameters
+    ----------
+    spec : dict
+        The 'spec' as returned by load_job_spec. Every location is one job
+        that keeps all requested parameters.
+
+    Returns
+    -------
+    summary : dict
+        The 'summary' holds the number of 'jobs', 'succeeded', the total
+        'seconds', the median and max 'job_seconds', 'failed' (location to
+        error message) and 'missing' (location to parameters). It is also
+        written to 'summary.json' in the output directory.
+
+    Notes
+    -----
+    Nothing is asked on the terminal: existing files are overwritten, only
+    while the jobs run, and request errors are counted as failures. The
+    parameter table, the HTTP session, the rate limit and the caches are
+    shared by all jobs, which run in a thread pool of 'workers'. Charts
+    are rendered afterwards in a process pool of 'render_workers', see
+    render_charts.
+
+    See Also
+    --------
+    load_job_spec : For more information about the spec.
+    run_job : For more information about a single job.
+    """
+    global prompt_files
+
+    start = monotonic()
+    previous_prompt, prompt_files = prompt_files, False
+    try:
+        makedirs(spec["output_dir"], exist_ok=True)
+        suffixes = ["." + i.lstrip(".") for i in spec["formats"]]
+        batch_resources(spec["workers"], spec["rate"])
+
+        summary = {"jobs": len(spec["locations"]), "succeeded": 0,
+                   "failed": {}, "missing": {}}
+        try:
+            parameters = smhi_web_crawler(url_doc, interactive=False,
+                                          write=False)
+        except Exception as error:
+            print(f">>> Parameter table was not loaded: {error}")
+            summary["failed"] = {i: str(error) for i in spec["locations"]}
+            return write_summary(summary, spec["output_dir"], start, [])
+
+        # Rows of the parameter table by name, as user_choice returns them.
+        rows = {name: parameters.iloc[i]
+                for i, name in enumerate(parameters.Parameter.iloc[:, 0])}
+        unknown = set(spec["parameters"]) - set(rows)
+        if unknown:
+            print(f">>> Unknown parameters are skipped: {sorted(unknown)}")
+        plot = rows if spec["plot"] else None
+
+        job_seconds = []
+        charts = []
+        with ThreadPoolExecutor(max_workers=spec["workers"]) as pool:
+            futures = [(location, pool.submit(
+                run_job, location, spec["parameters"], spec["output_dir"],
+                suffixes, plot)) for location in spec["locations"]]
+            for location, future in futures:
+                try:
+                    result = future.result()
+                except Exception as error:
+                    print(f">>> Job failed for {location}: {error}")
+                    summary["failed"][location] = str(error)
+                    continue
+                summary["succeeded"] += 1
+                job_seconds.append(result["seconds"])
+                charts += result["charts"]
+                if result["missing"]:
+                    summary["missing"][location] = result["missing"]
+
+        if charts:
+            render_start = monotonic()
+            render_charts(charts, workers=spec["render_workers"])
+            summary["render_seconds"] = monotonic() - render_start
+
+        return write_summary(summary, spec["output_dir"], start,
+                             job_seconds)
+    finally:
+        prompt_files = previous_prompt
+
+
+def write_summary(summary, output_dir, start, job_seconds):
+    """The function completes the summary of run_jobs and writes it.
+
+    Parameters
+    ----------
+    summary : dict
+        The 'summary' of run_jobs, updated in place.
+
+    output_dir : str
+        The 'output_dir' where 'summary.json' is written.
+
+    start : float
+        The 'start' of the run, from time.monotonic.
+
+    job_seconds : list
+        The 'job_seconds' of the succeeded jobs.
+
+    Returns
+    -------
+    summary : dict
+        The 'summary' with 'seconds' and 'job_seconds' added.
+    """
+    summary["seconds"] = monotonic() - start
+    summary["job_seconds"] = {
+        "median": median(job_seconds) if job_seconds else 0.0,
+        "max": max(job_seconds, default=0.0)}
+
+    with open(join(output_dir, "summary.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f">>> {summary['succeeded']} of {summary['jobs']} jobs "
+          f"succeeded in {summary['seconds']:.1f} s")
+    return summary
+
+
 def main():
     """ This function streamlines the calling of different functions.
 
@@ -806,8 +2471,81 @@ def main():
 
 
 if __name__ == "__main__":
-    prompt = main()
-    print(prompt)
+    args = ArgumentParser(description="Plots smhi forecasts of a location")
+    args.add_argument(
+        "--no-cache", action="store_true",
+        help="Always fetch forecasts from smhi, ignoring the on-disk cache")
+    args.add_argument(
+        "--cache-dir", type=str, default=".smhi_cache",
+        help="Directory of the on-disk forecast cache")
+    args.add_argument(
+        "--cache-ttl", type=float, default=1800.0,
+        help="Seconds a cached forecast is used without asking smhi")
+    args.add_argument(
+        "--geocode-ttl", type=float, default=None,
+        help="Seconds a geocoded address is kept, default forever")
+    args.add_argument(
+        "--format", type=str, default="csv",
+        choices=[i.lstrip(".") for i in OUTPUT_SUFFIXES],
+        help="File type of the data files, csv is the default")
+    args.add_argument(
+        "--jobs", type=str, default=None,
+        help="Run the json job spec unattended, e.g. from cron")
+    args.add_argument(
+        "--locations", type=str, nargs="+", default=None,
+        help="Fetch the forecasts of these locations without prompting")
+    args.add_argument(
+        "--locations-file", type=str, default=None,
+        help="File with one location per line, see --locations")
+    args.add_argument(
+        "--workers", type=int, default=8,
+        help="Locations fetched at the same time in a batch")
+    args.add_argument(
+        "--rate", type=float, default=None,
+        help="Maximum requests per second sent to smhi in a batch")
+    args.add_argument(
+        "--compact", action="store_true",
+        help="Keep the batch with categorical and float32 columns")
+    args.add_argument(
+        "--wide", action="store_true",
+        help="Write the batch with one column per parameter")
+    args.add_argument(
+        "--output", type=str, default="smhi_batch",
+        help="File name of the combined batch forecast, without suffix")
+    smhi_args = args.parse_args()
+    configure_cache(enabled=not smhi_args.no_cache,
+                    directory=smhi_args.cache_dir, ttl=smhi_args.cache_ttl)
+    configure_geocode_cache(ttl=smhi_args.geocode_ttl)
+    configure_output("." + smhi_args.format)
+
+    locations = list(smhi_args.locations or [])
+    if smhi_args.locations_file:
+        with open(smhi_args.locations_file) as f:
+            locations += [line.strip() for line in f if line.strip()]
+
+    if smhi_args.jobs:
+        spec = load_job_spec(smhi_args.jobs)
+        if not spec:
+            exit(2)
+        summary = run_jobs(spec)
+        exit(1 if summary["failed"] else 0)
+    elif locations:
+        batch, failures = smhi_batch(locations, workers=smhi_args.workers,
+                                     rate=smhi_args.rate,
+                                     compact=smhi_args.compact)
+        if not batch.empty and smhi_args.wide:
+            batch, file_name = export_wide(batch, smhi_args.output)
+            print(f"{file_name}{output_suffix} was created")
+        elif not batch.empty:
+            file_name = write_frame(batch, smhi_args.output)
+            print(f"{file_name}{output_suffix} was created")
+        # Repeated addresses are fetched once by smhi_batch.
+        fetched = len(dict.fromkeys(locations))
+        print(f">>> {fetched - len(failures)} of {fetched} locations "
+              f"fetched")
+    else:
+        prompt = main()
+        print(prompt)
 
 
 